@@ -35,10 +35,32 @@ HIJRI_MONTH_TO_NUMBER = {
 current_date = datetime.now()
 month_hijri = convert.Gregorian(current_date.year, current_date.month, 1).to_hijri()
 
+@st.cache_resource
+def get_checker():
+    # Load the model once per process instead of on every button press
+    return MoroccanHilalChecker()
+
+def _prediction_row(month_name, miladi_year, miladi_month, miladi_day, probability):
+    return {
+        'Hijri Month': month_name,
+        'Predicted Date': f"{miladi_year:04d}-{miladi_month:02d}-{miladi_day:02d}",
+        'Confidence': f"{probability * 100:.2f}%"
+    }
+
 def generate_predictions_for_year(hijri_year):
-    checker = MoroccanHilalChecker()
+    checker = get_checker()
+
+    try:
+        calendar = checker.get_year_calendar(
+            hijri_year,
+            thresholds=(HIGH_CONFIDENCE_THRESHOLD,)
+        )[HIGH_CONFIDENCE_THRESHOLD]
+        return pd.DataFrame([_prediction_row(*row) for row in calendar])
+    except Exception:
+        # Fall back to one month at a time, so that a failure only affects its month
+        pass
+
     predictions = []
-    
     for month_name in HIJRI_MONTH_TO_NUMBER.keys():
         try:
             miladi_year, miladi_month, miladi_day, probability = checker.get_miladi_day_for_hilal(
@@ -46,11 +68,7 @@ def generate_predictions_for_year(hijri_year):
                 month_name,
                 probability_threshold=HIGH_CONFIDENCE_THRESHOLD
             )
-            predictions.append({
-                'Hijri Month': month_name,
-                'Predicted Date': f"{miladi_year:04d}-{miladi_month:02d}-{miladi_day:02d}",
-                'Confidence': f"{probability * 100:.2f}%"
-            })
+            predictions.append(_prediction_row(month_name, miladi_year, miladi_month, miladi_day, probability))
         except Exception as e:
             predictions.append({
                 'Hijri Month': month_name,
@@ -80,18 +98,18 @@ def main():
     
     # Button to trigger computation for single month
     if st.button("Predict the beginning of the month"):
-        checker = MoroccanHilalChecker()
+        checker = get_checker()
         try:
-            miladi_year, miladi_month, miladi_day, probability = checker.get_miladi_day_for_hilal(
-                hijri_year, 
-                hijri_month_name,
+            # Both thresholds are derived from a single computation of the candidate evenings
+            trajectory = checker.get_visibility_trajectory(hijri_year, hijri_month_name)
+            miladi_year, miladi_month, miladi_day, probability = checker.first_day_from_trajectory(
+                trajectory,
                 probability_threshold=LOW_CONFIDENCE_THRESHOLD
             )
             
             if probability >= LOW_CONFIDENCE_THRESHOLD and probability < HIGH_CONFIDENCE_THRESHOLD:
-                next_year, next_month, next_day, next_probability = checker.get_miladi_day_for_hilal(
-                    hijri_year,
-                    hijri_month_name,
+                next_year, next_month, next_day, next_probability = checker.first_day_from_trajectory(
+                    trajectory,
                     probability_threshold=HIGH_CONFIDENCE_THRESHOLD
                 )
                 
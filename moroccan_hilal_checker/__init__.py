@@ -1 +1,10 @@
-from .moroccan_hilal_checker import MoroccanHilalChecker
\ No newline at end of file
+from .moroccan_hilal_checker import EveningVisibility, MoroccanHilalChecker, VisibilityUncertainty
+from .scoring import LinearVisibilityModel, VisibilityScorer, export_linear_model
+
+
+def __getattr__(name):
+    # asyncio is only imported by the services that need the coroutine API
+    if name == "AsyncMoroccanHilalChecker":
+        from .async_checker import AsyncMoroccanHilalChecker
+        return AsyncMoroccanHilalChecker
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
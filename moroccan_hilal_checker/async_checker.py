@@ -0,0 +1,107 @@
+import asyncio
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Hashable, List, Optional, Sequence, Tuple
+
+from .moroccan_hilal_checker import MoroccanHilalChecker
+
+
+class AsyncMoroccanHilalChecker:
+    """An asyncio front end of MoroccanHilalChecker for async web servers.
+
+    The astronomy runs in a bounded executor so it never blocks the event loop.
+    Concurrent identical requests are deduplicated: they all await the same
+    computation (single-flight), which is cancelled once every caller waiting for it
+    has been cancelled (a computation already running in a thread still finishes).
+
+    Example:
+        checker = AsyncMoroccanHilalChecker()
+        year, month, day, probability = await checker.get_miladi_day_for_hilal(1446, "Ramadan")
+    """
+
+    def __init__(
+        self,
+        checker: Optional[MoroccanHilalChecker] = None,
+        executor: Optional[Executor] = None,
+        max_workers: int = 4
+    ):
+        """Initialize the AsyncMoroccanHilalChecker.
+
+        Args:
+            checker: Optional checker running the computations. If not provided,
+                     a MoroccanHilalChecker with the default model is created and owned.
+            executor: Optional executor running the computations. If not provided,
+                      a thread pool of `max_workers` threads is created and owned.
+            max_workers: Maximum number of concurrent computations of the default executor.
+        """
+        self._owns_checker = checker is None
+        self.checker = checker or MoroccanHilalChecker()
+        self._owns_executor = executor is None
+        self.executor = executor or ThreadPoolExecutor(max_workers=max_workers)
+        # Key -> (shared future, number of callers awaiting it)
+        self._inflight: Dict[Hashable, List[Any]] = {}
+
+    async def get_miladi_day_for_hilal(
+        self,
+        hijri_year: int,
+        hijri_month_name: str,
+        mor_hilal_vis_model: Optional[object] = None,
+        probability_threshold: float = 0.9
+    ) -> Tuple[int, int, int, float]:
+        """Coroutine version of MoroccanHilalChecker.get_miladi_day_for_hilal."""
+        return await self._single_flight(
+            ("month", hijri_year, hijri_month_name, id(mor_hilal_vis_model), probability_threshold),
+            self.checker.get_miladi_day_for_hilal,
+            hijri_year, hijri_month_name, mor_hilal_vis_model, probability_threshold
+        )
+
+    async def get_year_calendar(
+        self,
+        hijri_year: int,
+        thresholds: Sequence[float] = (0.9,),
+        mor_hilal_vis_model: Optional[object] = None
+    ) -> Dict[float, List[Tuple[str, int, int, int, float]]]:
+        """Coroutine version of MoroccanHilalChecker.get_year_calendar."""
+        thresholds = tuple(thresholds)
+        return await self._single_flight(
+            ("year", hijri_year, thresholds, id(mor_hilal_vis_model)),
+            self.checker.get_year_calendar,
+            hijri_year, thresholds, mor_hilal_vis_model
+        )
+
+    async def _single_flight(self, key: Hashable, func: Callable[..., Any], *args: Any) -> Any:
+        """Run `func(*args)` in the executor, sharing the result between identical requests."""
+        loop = asyncio.get_running_loop()
+        entry = self._inflight.get(key)
+        if entry is None:
+            entry = [loop.run_in_executor(self.executor, func, *args), 0]
+            self._inflight[key] = entry
+            entry[0].add_done_callback(lambda _: self._forget(key, entry))
+        entry[1] += 1
+        try:
+            return await asyncio.shield(entry[0])
+        except asyncio.CancelledError:
+            # Stop the computation when nobody is waiting for it anymore
+            if entry[1] == 1:
+                entry[0].cancel()
+                self._forget(key, entry)
+            raise
+        finally:
+            entry[1] -= 1
+
+    def _forget(self, key: Hashable, entry: List[Any]) -> None:
+        """Remove a finished or cancelled computation from the in-flight requests."""
+        if self._inflight.get(key) is entry:
+            del self._inflight[key]
+
+    async def close(self) -> None:
+        """Shut down the owned executor and the worker processes of the owned checker."""
+        if self._owns_executor:
+            await asyncio.get_running_loop().run_in_executor(None, self.executor.shutdown)
+        if self._owns_checker:
+            self.checker.close()
+
+    async def __aenter__(self) -> "AsyncMoroccanHilalChecker":
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self.close()
@@ -1,10 +1,18 @@
-import pandas as pd
 from hijri_converter import convert
-from utils.odeh import calculate 
+from utils.odeh import calculate, calculate_features
+from utils.cache import CalculationCache
+from utils.criteria import CRITERIA, ScorerCriterion, evaluate_criteria
 import utils.astronomy_ as astronomy
 import pickle
+import threading
+import numpy as np
+from .scoring import LinearVisibilityModel, VisibilityScorer
+from datetime import date, timedelta
 from pathlib import Path
-from typing import Tuple, Optional, Dict
+from typing import Tuple, Optional, Dict, List, Sequence, NamedTuple, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from concurrent.futures import ProcessPoolExecutor
 
 HIJRI_MONTH_TO_NUMBER: Dict[str, int] = {
     "Muharram": 1,
@@ -24,6 +32,84 @@ HIJRI_MONTH_TO_NUMBER: Dict[str, int] = {
 CURRENT_DIR = Path(__file__).resolve().parent
 MODEL_PATH = CURRENT_DIR / ".." / "models" / "logistic_regression_model.pkl"
 MODEL_PATH = MODEL_PATH.resolve()
+# Coefficients of the same model, loaded with NumPy only (see scoring.export_linear_model)
+MODEL_JSON_PATH = MODEL_PATH.with_suffix(".json")
+
+# Rabat coordinates, longitude east positive
+RABAT_LATITUDE = 34.0084
+RABAT_LONGITUDE = -6.8539
+
+
+def model_site(latitude: float, longitude: float) -> Tuple[float, float]:
+    """Return the coordinates at which the model features of a real site are computed.
+
+    The visibility model was trained on parameters computed with the sign of Rabat's
+    longitude flipped (east positive 6.8539 instead of -6.8539). Every prediction of the
+    model applies the same convention through this function, so that a site is always
+    scored as in the training data, whichever method evaluates it.
+
+    Args:
+        latitude: Real latitude of the site in degrees.
+        longitude: Real longitude of the site in degrees, east positive.
+
+    Returns:
+        The (latitude, longitude) given to the astronomical calculations of the model.
+    """
+    return latitude, -longitude
+
+
+# Coordinates of the single-site predictions
+TRAINING_SITE: Tuple[float, float] = model_site(RABAT_LATITUDE, RABAT_LONGITUDE)
+
+# Observation sites for the multi-site mode, as (latitude, longitude east positive)
+MOROCCAN_SITES: Dict[str, Tuple[float, float]] = {
+    "Rabat": (RABAT_LATITUDE, RABAT_LONGITUDE),
+    "Tangier": (35.7595, -5.8340),
+    "Oujda": (34.6814, -1.9086),
+    "Marrakech": (31.6295, -7.9811),
+    "Agadir": (30.4278, -9.5981),
+    "Laayoune": (27.1253, -13.1625),
+    "Dakhla": (23.6848, -15.9580),
+}
+
+# How the probabilities of the sites are combined in the multi-site mode: "max" takes the
+# most favourable site, "independent" the probability that at least one site sees the
+# hilal if the sightings were independent (they are not for nearby sites, which inflates it)
+SITE_AGGREGATIONS = ("max", "independent")
+
+MAX_ITERATIONS = 30
+# Evenings evaluated from the day of the astronomical new moon: the hilal is always
+# visible from Rabat by the third evening
+CONJUNCTION_WINDOW_DAYS = 3
+# A Hijri month lasts at least 29 days: the earliest doubt night is the 29th
+MIN_MONTH_DAYS = 29
+
+class EveningVisibility(NamedTuple):
+    """The hilal visibility predicted on one candidate evening.
+
+    The astronomical fields are None when they cannot be computed, e.g. when the Moon
+    sets before the Sun. In multi-site mode they are those of the most favourable site
+    and the probability is the aggregate one.
+    """
+    evening: date
+    arcv: Optional[float]
+    w_topo: Optional[float]
+    v: Optional[float]
+    q_code: Optional[str]
+    prediction: int
+    probability: float
+
+
+class VisibilityUncertainty(NamedTuple):
+    """The spread of the hilal visibility probability over uncertain observing conditions."""
+    evening: date
+    probability: float          # nominal observer and standard atmosphere
+    mean: float
+    low: float                  # bounds of the central interval at the requested confidence
+    high: float
+    visible_fraction: float     # fraction of the samples with a probability above 0.5
+    samples: int
+
 
 class MoroccanHilalChecker:
     """A class to check for the visibility of the new moon (hilal) in Morocco.
@@ -33,27 +119,66 @@ class MoroccanHilalChecker:
     Islamic months.
     """
     
-    def __init__(self, model_path: Optional[Path] = None):
+    def __init__(
+        self,
+        model_path: Optional[Path] = None,
+        cache: Optional[CalculationCache] = None,
+        sites: Optional[Dict[str, Tuple[float, float]]] = None,
+        max_workers: Optional[int] = None,
+        site_aggregation: str = "max"
+    ):
         """Initialize the MoroccanHilalChecker.
         
         Args:
-            model_path: Optional path to the machine learning model file. If not provided,
-                       uses the default model path.
+            model_path: Optional path to the machine learning model file, either a pickle or
+                       an exported JSON artifact. If not provided, uses the default JSON
+                       artifact, or the default pickled model if the artifact is missing.
+            cache: Optional persistent cache of the astronomical parameters. If not provided,
+                   the parameters are computed for every evaluated evening.
+            sites: Optional observation sites, mapping a name to its real (latitude, longitude).
+                   If provided, the hilal is considered visible when it is seen from any of
+                   them (e.g. MOROCCAN_SITES). If not provided, only Rabat is used.
+            max_workers: Maximum number of worker processes evaluating the sites.
+                        If not provided, uses the number of processors.
+            site_aggregation: How the site probabilities are combined, one of
+                              SITE_AGGREGATIONS. Defaults to the most favourable site.
 
+        Raises:
+            ValueError: If the site aggregation is unknown
         """
-        self.model_path = model_path or MODEL_PATH
+        if site_aggregation not in SITE_AGGREGATIONS:
+            raise ValueError(f"Unknown site aggregation: {site_aggregation}")
+        self.model_path = model_path or (MODEL_JSON_PATH if MODEL_JSON_PATH.exists() else MODEL_PATH)
+        self.cache = cache
+        self.sites = sites
+        self.max_workers = max_workers
+        self.site_aggregation = site_aggregation
+        self._executor: Optional["ProcessPoolExecutor"] = None
+        # The checker may be called from several threads, e.g. by AsyncMoroccanHilalChecker
+        self._executor_lock = threading.Lock()
         self._load_model()
         
     def _load_model(self) -> None:
         """Load the machine learning model for hilal visibility prediction."""
         try:
-            with open(self.model_path, "rb") as file:
-                self.mor_hilal_vis_model = pickle.load(file)
+            if Path(self.model_path).suffix == ".json":
+                # Avoids importing scikit-learn
+                self.mor_hilal_vis_model = LinearVisibilityModel.load(self.model_path)
+            else:
+                with open(self.model_path, "rb") as file:
+                    self.mor_hilal_vis_model = pickle.load(file)
+            self.scorer = VisibilityScorer(self.mor_hilal_vis_model)
         except FileNotFoundError:
             raise FileNotFoundError(f"Model file not found at {self.model_path}")
         except Exception as e:
             raise RuntimeError(f"Error loading model: {str(e)}")
     
+    def _get_scorer(self, mor_hilal_vis_model: Optional[object] = None) -> VisibilityScorer:
+        """Return the scorer of a custom model, or of the instance model if not provided."""
+        if mor_hilal_vis_model is None or mor_hilal_vis_model is self.mor_hilal_vis_model:
+            return self.scorer
+        return VisibilityScorer(mor_hilal_vis_model)
+
     def get_miladi_day_for_hilal(
         self,
         hijri_year: int,
@@ -88,7 +213,7 @@ class MoroccanHilalChecker:
             Exception: For other unexpected errors during calculation
         """
         # Use instance values if not provided
-        mor_hilal_vis_model = mor_hilal_vis_model or self.mor_hilal_vis_model
+        scorer = self._get_scorer(mor_hilal_vis_model)
 
         # Validate Hijri month
         hijri_month = HIJRI_MONTH_TO_NUMBER.get(hijri_month_name)
@@ -96,59 +221,457 @@ class MoroccanHilalChecker:
             raise ValueError(f"Invalid Hijri month name: {hijri_month_name}")
 
         hijri_day = 1
-        max_iterations = 30
-        iterations = 0
-        day_offset = -1
 
         try:
             # Convert the first theoretical Hijri date to Gregorian
             gregorian_date = convert.Hijri(hijri_year, hijri_month, hijri_day).to_gregorian()
-            
-            while iterations < max_iterations:
-                # Calculate the "doubt night" (29th of previous month)
-                doubt_night = astronomy.Time.Make(
-                    gregorian_date.year,
-                    gregorian_date.month,
-                    gregorian_date.day,
-                    0, 0, 0
-                ).AddDays(day_offset)
-                
-                # Calculate astronomical parameters for Rabat
-                utc_time = doubt_night.Utc()
-                parameters = calculate(
-                    base_time=astronomy.Time.Make(utc_time.year, utc_time.month, utc_time.day, 0, 0, 0),
-                    latitude=34.0084,  # Rabat coordinates
-                    longitude=6.8539
-                )
-                
-                # Validate required parameters
-                if "ARCV" not in parameters or "W_topo" not in parameters:
-                    day_offset += 1
-                    iterations += 1
-                    continue
-
-                # Make prediction using the model
-                test_df = pd.DataFrame([{
-                    "arcv": parameters["ARCV"],
-                    "W_topo": parameters["W_topo"]
-                }])
-                
-                prediction = int(mor_hilal_vis_model.predict(test_df)[0])
-                probability = mor_hilal_vis_model.predict_proba(test_df)[0][1]
-
-                if prediction == 1 and probability >= probability_threshold:
-                    # First day of the month is the day after the last day the hilal is visible
-                    first_day_of_the_month = doubt_night.AddDays(1)
-                    utc_first_day = first_day_of_the_month.Utc()
-                    return (utc_first_day.year, utc_first_day.month, utc_first_day.day, probability)
-
-                day_offset += 1
-                iterations += 1
-
-            raise RuntimeError(
-                f"Failed to determine the correct hilal date within {max_iterations} iterations. "
-                f"Last calculated probability: {probability:.2f}"
+
+            # Only the evenings following the true new moon can show the hilal
+            conjunction_date = self._conjunction_date(
+                date(gregorian_date.year, gregorian_date.month, gregorian_date.day)
+            )
+            return self._search_first_day(
+                conjunction_date,
+                scorer,
+                probability_threshold,
+                {},
+                CONJUNCTION_WINDOW_DAYS
             )
 
         except Exception as e:
             raise RuntimeError(f"Error calculating hilal date: {str(e)}")
+
+    def get_visibility_trajectory(
+        self,
+        hijri_year: int,
+        hijri_month_name: str,
+        mor_hilal_vis_model: Optional[object] = None
+    ) -> List[EveningVisibility]:
+        """Calculate the hilal visibility on every candidate evening of a Hijri month.
+
+        The candidate evenings are the ones searched by get_miladi_day_for_hilal. Each is
+        computed once, so the first day of the month for any number of thresholds can
+        then be derived with first_day_from_trajectory at no extra cost.
+
+        Args:
+            hijri_year: The Hijri year.
+            hijri_month_name: The name of the Hijri month (e.g., "Ramadan").
+            mor_hilal_vis_model: Optional custom model for hilal visibility prediction.
+                                If not provided, uses the default model.
+
+        Returns:
+            The visibility of each candidate evening, in chronological order.
+
+        Raises:
+            ValueError: If the provided Hijri month name is invalid
+            RuntimeError: For errors during calculation
+        """
+        scorer = self._get_scorer(mor_hilal_vis_model)
+
+        hijri_month = HIJRI_MONTH_TO_NUMBER.get(hijri_month_name)
+        if hijri_month is None:
+            raise ValueError(f"Invalid Hijri month name: {hijri_month_name}")
+
+        try:
+            gregorian_date = convert.Hijri(hijri_year, hijri_month, 1).to_gregorian()
+            conjunction_date = self._conjunction_date(
+                date(gregorian_date.year, gregorian_date.month, gregorian_date.day)
+            )
+            return [
+                self._predict_evening(conjunction_date + timedelta(days=day_offset), scorer)
+                for day_offset in range(CONJUNCTION_WINDOW_DAYS)
+            ]
+
+        except Exception as e:
+            raise RuntimeError(f"Error calculating hilal trajectory: {str(e)}")
+
+    @staticmethod
+    def first_day_from_trajectory(
+        trajectory: Sequence[EveningVisibility],
+        probability_threshold: float = 0.9
+    ) -> Tuple[int, int, int, float]:
+        """Derive the first day of a Hijri month from its visibility trajectory.
+
+        Args:
+            trajectory: The candidate evenings returned by get_visibility_trajectory.
+            probability_threshold: The probability threshold for visibility.
+
+        Returns:
+            The same tuple (year, month, day, probability) as get_miladi_day_for_hilal.
+
+        Raises:
+            RuntimeError: If the hilal is not visible on any of the evenings
+        """
+        probability = 0.0
+        for visibility in trajectory:
+            probability = visibility.probability
+            if visibility.prediction == 1 and probability >= probability_threshold:
+                first_day_of_the_month = visibility.evening + timedelta(days=1)
+                return (first_day_of_the_month.year, first_day_of_the_month.month, first_day_of_the_month.day, probability)
+
+        raise RuntimeError(
+            f"Failed to determine the correct hilal date within {len(trajectory)} iterations. "
+            f"Last calculated probability: {probability:.2f}"
+        )
+
+    def get_year_calendar(
+        self,
+        hijri_year: int,
+        thresholds: Sequence[float] = (0.9,),
+        mor_hilal_vis_model: Optional[object] = None
+    ) -> Dict[float, List[Tuple[str, int, int, int, float]]]:
+        """Calculate the Gregorian first day of every month of a Hijri year.
+
+        Every month is anchored on the astronomical new moon following the month found
+        just before it, and never starts its search before the 29th day of that month,
+        so the year is walked once instead of restarting from the tabular calendar twelve
+        times. Only Muharram uses the tabular Hijri calendar to locate its new moon.
+        The astronomical parameters of every evening are computed at most once and
+        shared between all the requested thresholds.
+
+        Args:
+            hijri_year: The Hijri year.
+            thresholds: Probability thresholds for visibility. A calendar is built for each.
+            mor_hilal_vis_model: Optional custom model for hilal visibility prediction.
+                                If not provided, uses the default model.
+
+        Returns:
+            A dictionary mapping each threshold to the list of its twelve months, each one
+            given as a tuple (hijri month name, year, month, day, probability).
+
+        Raises:
+            RuntimeError: If a valid hilal date cannot be determined for one of the months
+        """
+        scorer = self._get_scorer(mor_hilal_vis_model)
+        evenings: Dict[date, EveningVisibility] = {}
+        calendars: Dict[float, List[Tuple[str, int, int, int, float]]] = {}
+
+        try:
+            gregorian_date = convert.Hijri(hijri_year, 1, 1).to_gregorian()
+            muharram_start = self._conjunction_date(
+                date(gregorian_date.year, gregorian_date.month, gregorian_date.day)
+            )
+            conjunctions: Dict[date, date] = {}
+
+            for threshold in thresholds:
+                calendar = []
+                start_date = muharram_start
+                for hijri_month_name in HIJRI_MONTH_TO_NUMBER:
+                    year, month, day, probability = self._search_first_day(
+                        start_date, scorer, threshold, evenings, CONJUNCTION_WINDOW_DAYS
+                    )
+                    calendar.append((hijri_month_name, year, month, day, probability))
+                    # The next month cannot end before its 29th day
+                    earliest_end = date(year, month, day) + timedelta(days=MIN_MONTH_DAYS - 1)
+                    if earliest_end not in conjunctions:
+                        conjunctions[earliest_end] = self._conjunction_date(earliest_end)
+                    start_date = max(earliest_end, conjunctions[earliest_end])
+                calendars[threshold] = calendar
+
+        except Exception as e:
+            raise RuntimeError(f"Error calculating hilal calendar: {str(e)}")
+
+        return calendars
+
+    def _search_first_day(
+        self,
+        start_date: date,
+        scorer: VisibilityScorer,
+        probability_threshold: float,
+        evenings: Dict[date, EveningVisibility],
+        max_evenings: int = MAX_ITERATIONS
+    ) -> Tuple[int, int, int, float]:
+        """Step forward from a doubt night until the model predicts a visible hilal.
+
+        Args:
+            start_date: The first doubt night to evaluate.
+            scorer: The scorer of the model used for hilal visibility prediction.
+            probability_threshold: The probability threshold for visibility.
+            evenings: Already evaluated evenings, mapping a date to its visibility.
+                     It is filled in place so the caller can share it.
+            max_evenings: The number of evenings evaluated before giving up.
+
+        Returns:
+            The Gregorian year, month and day of the first day of the month and the
+            probability of hilal visibility on the previous evening.
+        """
+        probability = 0.0
+
+        for day_offset in range(max_evenings):
+            # Calculate the "doubt night" (29th of previous month)
+            doubt_night = start_date + timedelta(days=day_offset)
+
+            if doubt_night not in evenings:
+                evenings[doubt_night] = self._predict_evening(doubt_night, scorer)
+            visibility = evenings[doubt_night]
+            probability = visibility.probability
+
+            if visibility.prediction == 1 and probability >= probability_threshold:
+                # First day of the month is the day after the last day the hilal is visible
+                first_day_of_the_month = doubt_night + timedelta(days=1)
+                return (first_day_of_the_month.year, first_day_of_the_month.month, first_day_of_the_month.day, probability)
+
+        raise RuntimeError(
+            f"Failed to determine the correct hilal date within {max_evenings} iterations. "
+            f"Last calculated probability: {probability:.2f}"
+        )
+
+    @staticmethod
+    def _conjunction_date(around: date) -> date:
+        """Find the UTC date of the astronomical new moon closest to a given date."""
+        start = astronomy.Time.Make(around.year, around.month, around.day, 0, 0, 0).AddDays(-15)
+        conjunction = astronomy.SearchMoonPhase(0, start, 30)
+        if conjunction is None:
+            raise RuntimeError(f"No new moon found around {around.isoformat()}")
+        utc_conjunction = conjunction.Utc()
+        return date(utc_conjunction.year, utc_conjunction.month, utc_conjunction.day)
+
+    def evaluate_sites(
+        self,
+        evening: date,
+        sites: Optional[Dict[str, Tuple[float, float]]] = None,
+        mor_hilal_vis_model: Optional[object] = None
+    ) -> Tuple[Dict[str, float], float]:
+        """Calculate the hilal visibility probability from several sites on a given evening.
+
+        The astronomical parameters of the sites are computed at their `model_site`
+        coordinates, as in the training data, in parallel across worker processes, then
+        scored in a single batch.
+
+        Args:
+            evening: The Gregorian date of the evening.
+            sites: Optional observation sites, mapping a name to its (latitude, longitude).
+                   If not provided, uses the instance sites or MOROCCAN_SITES.
+            mor_hilal_vis_model: Optional custom model for hilal visibility prediction.
+                                If not provided, uses the default model.
+
+        Returns:
+            A tuple containing:
+            - the probability of hilal visibility for each site
+            - the aggregate probability, combined as set by `site_aggregation`
+        """
+        return self._evaluate_sites(
+            evening, sites or self.sites or MOROCCAN_SITES, self._get_scorer(mor_hilal_vis_model)
+        )
+
+    def evaluate_criteria(
+        self,
+        evening: date,
+        latitude: float = RABAT_LATITUDE,
+        longitude: float = RABAT_LONGITUDE,
+        mor_hilal_vis_model: Optional[object] = None
+    ) -> Dict[str, Tuple[float, str]]:
+        """Compare the Moroccan model with the other registered visibility criteria.
+
+        The astronomical parameters are computed once and shared by the registered
+        criteria. The Moroccan model is evaluated at the `model_site` coordinates, as
+        in the training data, so that it gives the probability used by the checker.
+
+        Args:
+            evening: The Gregorian date of the evening.
+            latitude: Real observer latitude in degrees. Defaults to Rabat.
+            longitude: Real observer longitude in degrees. Defaults to Rabat.
+            mor_hilal_vis_model: Optional custom model for hilal visibility prediction.
+                                If not provided, uses the default model.
+
+        Returns:
+            A dictionary mapping each criterion ("odeh", "yallop", ..., "moroccan_ml") to its
+            value and visibility code.
+        """
+        base_time = astronomy.Time.Make(evening.year, evening.month, evening.day, 0, 0, 0)
+        results = evaluate_criteria(base_time, latitude, longitude, criteria=CRITERIA)
+        results.update(evaluate_criteria(
+            base_time, *model_site(latitude, longitude),
+            criteria={"moroccan_ml": ScorerCriterion(self._get_scorer(mor_hilal_vis_model))}
+        ))
+        return results
+
+    def get_visibility_uncertainty(
+        self,
+        evening: date,
+        latitude: float = RABAT_LATITUDE,
+        longitude: float = RABAT_LONGITUDE,
+        height: float = 0.0,
+        samples: int = 2000,
+        position_sigma: float = 0.05,
+        height_sigma: float = 50.0,
+        refraction_sigma: float = 0.15,
+        confidence: float = 0.9,
+        seed: Optional[int] = None,
+        mor_hilal_vis_model: Optional[object] = None
+    ) -> VisibilityUncertainty:
+        """Estimate the uncertainty of the visibility probability with a Monte Carlo simulation.
+
+        Observers are drawn around the nominal site with normal errors on their position
+        and elevation (clipped at sea level) and on the refraction at the horizon, and
+        are all computed in one vectorized batch. As every prediction of the model, they
+        are computed at the `model_site` coordinates, so that the nominal probability
+        of Rabat is the one used by `get_miladi_day_for_hilal`.
+
+        Args:
+            evening: The Gregorian date of the evening.
+            latitude: Real nominal observer latitude in degrees. Defaults to Rabat.
+            longitude: Real nominal observer longitude in degrees. Defaults to Rabat.
+            height: Nominal observer elevation in meters.
+            samples: Number of simulated observers.
+            position_sigma: Standard deviation of the latitude and longitude, in degrees.
+            height_sigma: Standard deviation of the elevation, in meters.
+            refraction_sigma: Relative standard deviation of the refraction at the horizon.
+            confidence: Probability covered by the reported interval.
+            seed: Optional seed of the random generator, for reproducible results.
+            mor_hilal_vis_model: Optional custom model for hilal visibility prediction.
+                                If not provided, uses the default model.
+
+        Returns:
+            The nominal probability and its distribution over the simulated conditions.
+            Samples where the Moon sets first, or does not set, count as not visible.
+        """
+        from utils.batch import calculate_batch
+
+        scorer = self._get_scorer(mor_hilal_vis_model)
+        latitude, longitude = model_site(latitude, longitude)
+        rng = np.random.default_rng(seed)
+        latitudes = latitude + position_sigma * rng.standard_normal(samples)
+        longitudes = longitude + position_sigma * rng.standard_normal(samples)
+        heights = np.clip(height + height_sigma * rng.standard_normal(samples), 0.0, None)
+        refraction = np.clip(1.0 + refraction_sigma * rng.standard_normal(samples), 0.0, None)
+        base_time = astronomy.Time.Make(evening.year, evening.month, evening.day, 0, 0, 0)
+        # The nominal observer is computed as in the predictions, the samples in one batch
+        nominal = self._score_parameters(
+            {"nominal": calculate_features(base_time, latitude, longitude, height)}, scorer
+        )["nominal"]
+        results = calculate_batch(base_time, latitudes, longitudes, heights, refraction)
+
+        probabilities = np.zeros(len(results))
+        ok = np.isfinite(results.ARCV)
+        if ok.any():
+            probabilities[ok] = scorer.predict_proba(results.ARCV[ok], results.W_topo[ok])
+        low, high = np.quantile(probabilities, [(1 - confidence) / 2, (1 + confidence) / 2])
+        return VisibilityUncertainty(
+            evening=evening,
+            probability=nominal,
+            mean=float(probabilities.mean()),
+            low=float(low),
+            high=float(high),
+            visible_fraction=float((probabilities > 0.5).mean()),
+            samples=samples
+        )
+
+    def _evaluate_sites(
+        self,
+        evening: date,
+        sites: Dict[str, Tuple[float, float]],
+        scorer: VisibilityScorer
+    ) -> Tuple[Dict[str, float], float]:
+        """Compute the per-site and aggregate probabilities of `evaluate_sites`."""
+        parameters = self._site_parameters(evening, sites)
+        probabilities = self._score_parameters(parameters, scorer)
+        return probabilities, self._aggregate(probabilities)
+
+    def _aggregate(self, probabilities: Dict[str, float]) -> float:
+        """Combine the probabilities of the sites as set by `site_aggregation`."""
+        if self.site_aggregation == "independent":
+            return 1.0 - float(np.prod([1.0 - p for p in probabilities.values()]))
+        return max(probabilities.values())
+
+    def _site_parameters(self, evening: date, sites: Dict[str, Tuple[float, float]]) -> Dict[str, dict]:
+        """Compute the model parameters of every site, in parallel worker processes.
+
+        The parameters are computed at the `model_site` coordinates of the sites.
+        """
+        base_time = astronomy.Time.Make(evening.year, evening.month, evening.day, 0, 0, 0)
+        sites = {name: model_site(*site) for name, site in sites.items()}
+
+        parameters = {}
+        if self.cache is not None:
+            for name, (latitude, longitude) in sites.items():
+                result = self.cache.get(base_time, latitude, longitude)
+                if result is not None:
+                    parameters[name] = result
+
+        missing = [name for name in sites if name not in parameters]
+        if missing:
+            results = self._get_executor().map(
+                calculate if self.cache is not None else calculate_features,
+                [base_time] * len(missing),
+                [sites[name][0] for name in missing],
+                [sites[name][1] for name in missing]
+            )
+            for name, result in zip(missing, results):
+                parameters[name] = result
+                if self.cache is not None:
+                    self.cache.put(base_time, sites[name][0], sites[name][1], result)
+
+        return {name: parameters[name] for name in sites}
+
+    @staticmethod
+    def _score_parameters(parameters: Dict[str, dict], scorer: VisibilityScorer) -> Dict[str, float]:
+        """Score a batch of astronomical parameters, unusable ones get a zero probability."""
+        visible = [name for name, result in parameters.items() if "ARCV" in result and "W_topo" in result]
+        probabilities = dict.fromkeys(parameters, 0.0)
+        if visible:
+            site_probabilities = scorer.predict_proba(
+                [parameters[name]["ARCV"] for name in visible],
+                [parameters[name]["W_topo"] for name in visible]
+            )
+            probabilities.update(zip(visible, site_probabilities.tolist()))
+        return probabilities
+
+    def _get_executor(self) -> "ProcessPoolExecutor":
+        """Return the worker processes of the multi-site mode, started on first use."""
+        with self._executor_lock:
+            if self._executor is None:
+                from concurrent.futures import ProcessPoolExecutor
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            return self._executor
+
+    def close(self) -> None:
+        """Shut down the worker processes of the multi-site mode."""
+        with self._executor_lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown()
+
+    def _predict_evening(self, doubt_night: date, scorer: VisibilityScorer) -> EveningVisibility:
+        """Predict the hilal visibility in Rabat, or from any site, on the evening of a given date.
+
+        Returns:
+            The visibility of the evening. Evenings where the astronomical parameters
+            cannot be computed are reported as not visible.
+        """
+        if self.sites:
+            parameters = self._site_parameters(doubt_night, self.sites)
+            probabilities = self._score_parameters(parameters, scorer)
+            probability = self._aggregate(probabilities)
+            best_site = max(probabilities, key=probabilities.get)
+            return self._evening_visibility(
+                doubt_night, parameters[best_site], int(probability > 0.5), probability
+            )
+
+        # Calculate astronomical parameters for Rabat, as in the training data
+        latitude, longitude = TRAINING_SITE
+        parameters = (self.cache.calculate if self.cache is not None else calculate_features)(
+            base_time=astronomy.Time.Make(doubt_night.year, doubt_night.month, doubt_night.day, 0, 0, 0),
+            latitude=latitude,
+            longitude=longitude
+        )
+
+        # Validate required parameters
+        if "ARCV" not in parameters or "W_topo" not in parameters:
+            return self._evening_visibility(doubt_night, parameters, 0, 0.0)
+
+        # Make prediction using the model
+        predictions, probabilities = scorer.predict(parameters["ARCV"], parameters["W_topo"])
+        return self._evening_visibility(doubt_night, parameters, int(predictions[0]), float(probabilities[0]))
+
+    @staticmethod
+    def _evening_visibility(evening: date, parameters: dict, prediction: int, probability: float) -> EveningVisibility:
+        return EveningVisibility(
+            evening=evening,
+            arcv=parameters.get("ARCV"),
+            w_topo=parameters.get("W_topo"),
+            v=parameters.get("V"),
+            q_code=parameters.get("q_code"),
+            prediction=prediction,
+            probability=probability
+        )
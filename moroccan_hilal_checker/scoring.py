@@ -0,0 +1,140 @@
+import json
+import numpy as np
+from pathlib import Path
+from typing import Tuple, Sequence, Union
+
+ArrayLike = Union[float, Sequence[float], np.ndarray]
+
+# Feature names used when the model was trained
+FEATURE_NAMES: Tuple[str, str] = ("arcv", "W_topo")
+
+
+class LinearVisibilityModel:
+    """A fitted logistic regression restored from its coefficients with NumPy only.
+
+    It exposes the attributes and the ``predict``/``predict_proba`` methods of the
+    sklearn ``LogisticRegression`` it was exported from, so it can be used in its place
+    without importing scikit-learn or unpickling anything.
+    """
+
+    def __init__(self, coef: Sequence[float], intercept: float, classes: Sequence[int] = (0, 1),
+                 feature_names: Sequence[str] = FEATURE_NAMES):
+        self.coef_ = np.asarray([coef], dtype=float)
+        self.intercept_ = np.asarray([intercept], dtype=float)
+        self.classes_ = np.asarray(classes)
+        self.feature_names_in_ = np.asarray(feature_names, dtype=object)
+
+    @classmethod
+    def load(cls, path: Union[str, Path]) -> "LinearVisibilityModel":
+        """Load a model written by `export_linear_model`."""
+        with open(path, "r", encoding="utf-8") as file:
+            artifact = json.load(file)
+        if artifact.get("type") != "logistic_regression":
+            raise ValueError(f"Unsupported model type: {artifact.get('type')}")
+        return cls(artifact["coef"], artifact["intercept"], artifact["classes"], artifact["features"])
+
+    def decision_function(self, X) -> np.ndarray:
+        X = np.asarray(X, dtype=float).reshape(-1, self.coef_.shape[1])
+        return X @ self.coef_[0] + self.intercept_[0]
+
+    def predict_proba(self, X) -> np.ndarray:
+        positive = 0.5 * (1.0 + np.tanh(0.5 * self.decision_function(X)))
+        return np.column_stack([1.0 - positive, positive])
+
+    def predict(self, X) -> np.ndarray:
+        return self.classes_[(self.decision_function(X) > 0).astype(int)]
+
+
+def export_linear_model(model: object, path: Union[str, Path]) -> None:
+    """Write the coefficients of a fitted binary logistic regression as a JSON artifact.
+
+    Args:
+        model: A fitted model exposing ``coef_``, ``intercept_`` and ``classes_``.
+        path: Path of the JSON file to write.
+    """
+    coef = np.asarray(model.coef_, dtype=float)
+    if coef.shape[0] != 1:
+        raise ValueError("Only binary linear models can be exported")
+    artifact = {
+        "type": "logistic_regression",
+        "features": [str(name) for name in getattr(model, "feature_names_in_", FEATURE_NAMES)],
+        "coef": coef[0].tolist(),
+        "intercept": float(np.asarray(model.intercept_, dtype=float)[0]),
+        "classes": [int(c) for c in model.classes_],
+    }
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(artifact, file, indent=2)
+
+
+class VisibilityScorer:
+    """Score hilal visibility for whole vectors of (ARCV, W_topo) candidates.
+
+    Linear models exposing ``coef_`` and ``intercept_`` (such as the pickled
+    ``LogisticRegression``) are reduced once to their weights and scored with a single
+    NumPy expression, without any pandas allocation or sklearn validation pass.
+    Any other classifier falls back to one batched ``predict_proba`` call.
+    """
+
+    def __init__(self, model: object):
+        """Initialize the VisibilityScorer.
+
+        Args:
+            model: A fitted binary classifier trained on the ``arcv`` and ``W_topo`` features.
+        """
+        self.model = model
+        classes = list(getattr(model, "classes_", [0, 1]))
+        self._positive_index = classes.index(1)
+
+        coef = getattr(model, "coef_", None)
+        intercept = getattr(model, "intercept_", None)
+        self.is_linear = coef is not None and intercept is not None and np.shape(coef)[0] == 1
+        if self.is_linear:
+            feature_names = list(getattr(model, "feature_names_in_", FEATURE_NAMES))
+            weights = np.asarray(coef, dtype=float)[0]
+            self._weights = np.array([weights[feature_names.index(name)] for name in FEATURE_NAMES])
+            self._intercept = float(np.asarray(intercept, dtype=float)[0])
+            # sklearn reports coef_ for classes_[1]
+            if self._positive_index == 0:
+                self._weights = -self._weights
+                self._intercept = -self._intercept
+
+    def predict_proba(self, arcv: ArrayLike, w_topo: ArrayLike) -> np.ndarray:
+        """Compute the probability of hilal visibility for every candidate.
+
+        Args:
+            arcv: The arc of vision of each candidate, in degrees.
+            w_topo: The topocentric crescent width of each candidate, in arcminutes.
+
+        Returns:
+            A 1-D array with the probability of the visible class for each candidate.
+        """
+        arcv = np.atleast_1d(np.asarray(arcv, dtype=float))
+        w_topo = np.atleast_1d(np.asarray(w_topo, dtype=float))
+
+        if self.is_linear:
+            decision = self._intercept + self._weights[0] * arcv + self._weights[1] * w_topo
+            # Numerically stable logistic function
+            return 0.5 * (1.0 + np.tanh(0.5 * decision))
+
+        import pandas as pd
+        features = pd.DataFrame({FEATURE_NAMES[0]: arcv, FEATURE_NAMES[1]: w_topo})
+        return np.asarray(self.model.predict_proba(features))[:, self._positive_index]
+
+    def predict(self, arcv: ArrayLike, w_topo: ArrayLike) -> Tuple[np.ndarray, np.ndarray]:
+        """Predict the visibility class and its probability for every candidate.
+
+        Returns:
+            A tuple containing the predictions (1 if the hilal is visible) and the
+            probabilities of hilal visibility.
+        """
+        probabilities = self.predict_proba(arcv, w_topo)
+        return (probabilities > 0.5).astype(int), probabilities
+
+
+if __name__ == "__main__":
+    # Export the pickled model: python -m moroccan_hilal_checker.scoring model.pkl model.json
+    import pickle
+    import sys
+
+    with open(sys.argv[1], "rb") as file:
+        export_linear_model(pickle.load(file), sys.argv[2])
@@ -0,0 +1,263 @@
+"""Local HTTP prediction service.
+
+The model is loaded once per process and results are kept in a bounded LRU cache.
+
+Usage:
+    python -m moroccan_hilal_checker.server --port 8000
+
+Endpoints:
+    GET /month?year=1446&month=Ramadan&threshold=0.9
+    GET /year?year=1446&thresholds=0.8,0.9
+    GET /stats
+    GET /tiles/q_code/2025-03-29/2/1/1.png (with --tile-dir)
+    GET /tiles/V/2025-03-29/2/1/1.bin (with --tile-dir)
+"""
+import argparse
+import json
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+import utils.astronomy_ as astronomy
+from utils.chebyshev import ChebyshevEphemeris
+from utils.tiles import LAYERS, TileCache
+from .moroccan_hilal_checker import MoroccanHilalChecker
+
+DEFAULT_THRESHOLD = 0.9
+TILE_CONTENT_TYPES = {"png": "image/png", "bin": "application/octet-stream"}
+
+
+class ResultCache:
+    """A thread-safe bounded LRU cache of computed results.
+
+    Concurrent misses of the same key are computed once (single-flight): the first
+    request computes the result while the others wait for it, as they would with
+    `AsyncMoroccanHilalChecker`.
+    """
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self._entries: "OrderedDict[Hashable, Any]" = OrderedDict()
+        # Key -> future of the computation in progress
+        self._inflight: Dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        """Return the cached result of `key`, computing and storing it on a miss.
+
+        Raises:
+            Exception: Any exception of `compute`, raised to every request waiting for it
+        """
+        with self._lock:
+            if key in self._entries:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return self._entries[key]
+            future = self._inflight.get(key)
+            waiting = future is not None
+            if waiting:
+                self.coalesced += 1
+            else:
+                self.misses += 1
+                future = self._inflight[key] = Future()
+        if waiting:
+            return future.result()
+
+        try:
+            result = compute()
+        except BaseException as exc:
+            # Failures are not cached: the next request computes again
+            with self._lock:
+                del self._inflight[key]
+            future.set_exception(exc)
+            raise
+        with self._lock:
+            self._entries[key] = result
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            del self._inflight[key]
+        future.set_result(result)
+        return result
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class LatencyRecorder:
+    """Keep the latest request latencies and report their percentiles."""
+
+    def __init__(self, window: int = 10_000):
+        self._latencies: deque = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.count = 0
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self._latencies.append(seconds)
+            self.count += 1
+
+    def percentiles(self) -> Dict[str, Optional[float]]:
+        """Return the p50, p95 and p99 latencies in milliseconds."""
+        with self._lock:
+            latencies = sorted(self._latencies)
+        if not latencies:
+            return {"p50_ms": None, "p95_ms": None, "p99_ms": None}
+        return {
+            f"p{q}_ms": 1000 * latencies[min(len(latencies) - 1, int(q / 100 * len(latencies)))]
+            for q in (50, 95, 99)
+        }
+
+
+class HilalService:
+    """The prediction logic of the HTTP service, independent of the transport."""
+
+    def __init__(
+        self,
+        checker: Optional[MoroccanHilalChecker] = None,
+        cache_size: int = 1024,
+        tiles: Optional[TileCache] = None
+    ):
+        self.checker = checker or MoroccanHilalChecker()
+        self.cache = ResultCache(cache_size)
+        self.latency = LatencyRecorder()
+        self.tiles = tiles
+
+    def month(self, year: int, month: str, threshold: float = DEFAULT_THRESHOLD) -> Dict[str, Any]:
+        miladi_year, miladi_month, miladi_day, probability = self.cache.get_or_compute(
+            ("month", year, month, threshold),
+            lambda: self.checker.get_miladi_day_for_hilal(year, month, probability_threshold=threshold)
+        )
+        return {
+            "hijri_year": year,
+            "hijri_month": month,
+            "threshold": threshold,
+            "date": f"{miladi_year:04d}-{miladi_month:02d}-{miladi_day:02d}",
+            "probability": probability,
+        }
+
+    def year(self, year: int, thresholds=(DEFAULT_THRESHOLD,)) -> Dict[str, Any]:
+        thresholds = tuple(thresholds)
+        calendars = self.cache.get_or_compute(
+            ("year", year, thresholds),
+            lambda: self.checker.get_year_calendar(year, thresholds)
+        )
+        return {
+            "hijri_year": year,
+            "calendars": {
+                str(threshold): [
+                    {
+                        "hijri_month": month,
+                        "date": f"{miladi_year:04d}-{miladi_month:02d}-{miladi_day:02d}",
+                        "probability": probability,
+                    }
+                    for month, miladi_year, miladi_month, miladi_day, probability in calendar
+                ]
+                for threshold, calendar in calendars.items()
+            },
+        }
+
+    def tile(self, path: str) -> Tuple[str, bytes]:
+        """Return the content type and content of a tile, from a path like q_code/2025-03-29/2/1/1.png."""
+        if self.tiles is None:
+            raise KeyError("tiles are not enabled")
+        layer, evening, z, x, name = path.split("/")
+        y, extension = name.split(".")
+        if LAYERS.get(layer) != extension:
+            raise ValueError(f"Unknown tile format: {layer}.{extension}")
+        year, month, day = (int(part) for part in evening.split("-"))
+        content = self.tiles.get(astronomy.Time.Make(year, month, day, 0, 0, 0), int(z), int(x), int(y), layer)
+        return TILE_CONTENT_TYPES[extension], content
+
+    def stats(self) -> Dict[str, Any]:
+        stats = {
+            "requests": self.latency.count,
+            "latency": self.latency.percentiles(),
+            "cache": {"entries": len(self.cache), "hits": self.cache.hits, "misses": self.cache.misses,
+                      "coalesced": self.cache.coalesced},
+        }
+        if self.tiles is not None:
+            stats["tiles"] = {"hits": self.tiles.hits, "misses": self.tiles.misses}
+        return stats
+
+
+def make_handler(service: HilalService):
+    """Create the request handler class serving `service`."""
+
+    class HilalRequestHandler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:
+            start = time.perf_counter()
+            url = urlparse(self.path)
+            query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+            content_type = "application/json"
+            try:
+                if url.path.startswith("/tiles/") and service.tiles is not None:
+                    status = 200
+                    content_type, payload = service.tile(url.path[len("/tiles/"):])
+                elif url.path == "/month":
+                    status, body = 200, service.month(
+                        int(query["year"]), query["month"], float(query.get("threshold", DEFAULT_THRESHOLD))
+                    )
+                elif url.path == "/year":
+                    thresholds = query.get("thresholds", str(DEFAULT_THRESHOLD))
+                    status, body = 200, service.year(
+                        int(query["year"]), [float(threshold) for threshold in thresholds.split(",")]
+                    )
+                elif url.path == "/stats":
+                    status, body = 200, service.stats()
+                else:
+                    status, body = 404, {"error": f"Unknown endpoint: {url.path}"}
+            except (KeyError, ValueError) as e:
+                status, body = 400, {"error": f"Invalid request: {e}"}
+            except RuntimeError as e:
+                status, body = 422, {"error": str(e)}
+
+            if content_type == "application/json":
+                payload = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+            if url.path != "/stats":
+                service.latency.record(time.perf_counter() - start)
+
+        def log_message(self, format: str, *args: Any) -> None:
+            pass
+
+    return HilalRequestHandler
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serve Moroccan hilal predictions over HTTP.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--cache-size", type=int, default=1024, help="Maximum number of cached results")
+    parser.add_argument("--tile-dir", help="Serve visibility map tiles, cached in this directory")
+    parser.add_argument("--tile-cache-mb", type=int, default=512, help="Maximum size of the tile cache")
+    parser.add_argument("--ephemeris", help="Chebyshev ephemeris file (see utils.chebyshev) for faster positions")
+    args = parser.parse_args()
+
+    if args.ephemeris:
+        astronomy.SetEphemerisCache(ChebyshevEphemeris(args.ephemeris))
+    tiles = TileCache(args.tile_dir, args.tile_cache_mb * 2 ** 20) if args.tile_dir else None
+    service = HilalService(cache_size=args.cache_size, tiles=tiles)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(service))
+    print(f"Serving hilal predictions on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
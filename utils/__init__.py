@@ -1,2 +1,4 @@
 from .astronomy_ import *
-from .odeh import *
\ No newline at end of file
+from .odeh import *
+from .cache import *
+from .batch import *
@@ -31,8 +31,10 @@ https://github.com/cosinekitty/astronomy
 
 """
 
+import bisect
 import math
 import datetime
+import numpy
 import enum
 import re
 import abc
@@ -157,6 +159,96 @@ def _NormalizeLongitude(lon: float) -> float:
     return lon
 
 
+# The piecewise polynomials of DeltaT_EspenakMeeus, as (upper year bound, polynomial of
+# the year y), shared by the scalar and array versions.
+def _DeltaTPiece0(y: Any) -> Any:
+    u = (y - 1820) / 100
+    return -20 + (32 * u*u)
+
+def _DeltaTPiece1(y: Any) -> Any:
+    u = y / 100
+    u2 = u*u; u3 = u*u2; u4 = u2*u2; u5 = u2*u3; u6 = u3*u3
+    return 10583.6 - 1014.41*u + 33.78311*u2 - 5.952053*u3 - 0.1798452*u4 + 0.022174192*u5 + 0.0090316521*u6
+
+def _DeltaTPiece2(y: Any) -> Any:
+    u = (y - 1000) / 100
+    u2 = u*u; u3 = u*u2; u4 = u2*u2; u5 = u2*u3; u6 = u3*u3
+    return 1574.2 - 556.01*u + 71.23472*u2 + 0.319781*u3 - 0.8503463*u4 - 0.005050998*u5 + 0.0083572073*u6
+
+def _DeltaTPiece3(y: Any) -> Any:
+    u = y - 1600
+    u2 = u*u; u3 = u*u2
+    return 120 - 0.9808*u - 0.01532*u2 + u3/7129.0
+
+def _DeltaTPiece4(y: Any) -> Any:
+    u = y - 1700
+    u2 = u*u; u3 = u*u2; u4 = u2*u2
+    return 8.83 + 0.1603*u - 0.0059285*u2 + 0.00013336*u3 - u4/1174000
+
+def _DeltaTPiece5(y: Any) -> Any:
+    u = y - 1800
+    u2 = u*u; u3 = u*u2; u4 = u2*u2; u5 = u2*u3; u6 = u3*u3; u7 = u3*u4
+    return 13.72 - 0.332447*u + 0.0068612*u2 + 0.0041116*u3 - 0.00037436*u4 + 0.0000121272*u5 - 0.0000001699*u6 + 0.000000000875*u7
+
+def _DeltaTPiece6(y: Any) -> Any:
+    u = y - 1860
+    u2 = u*u; u3 = u*u2; u4 = u2*u2; u5 = u2*u3
+    return 7.62 + 0.5737*u - 0.251754*u2 + 0.01680668*u3 - 0.0004473624*u4 + u5/233174
+
+def _DeltaTPiece7(y: Any) -> Any:
+    u = y - 1900
+    u2 = u*u; u3 = u*u2; u4 = u2*u2
+    return -2.79 + 1.494119*u - 0.0598939*u2 + 0.0061966*u3 - 0.000197*u4
+
+def _DeltaTPiece8(y: Any) -> Any:
+    u = y - 1920
+    u2 = u*u; u3 = u*u2
+    return 21.20 + 0.84493*u - 0.076100*u2 + 0.0020936*u3
+
+def _DeltaTPiece9(y: Any) -> Any:
+    u = y - 1950
+    u2 = u*u; u3 = u*u2
+    return 29.07 + 0.407*u - u2/233 + u3/2547
+
+def _DeltaTPiece10(y: Any) -> Any:
+    u = y - 1975
+    u2 = u*u; u3 = u*u2
+    return 45.45 + 1.067*u - u2/260 - u3/718
+
+def _DeltaTPiece11(y: Any) -> Any:
+    u = y - 2000
+    u2 = u*u; u3 = u*u2; u4 = u2*u2; u5 = u2*u3
+    return 63.86 + 0.3345*u - 0.060374*u2 + 0.0017275*u3 + 0.000651814*u4 + 0.00002373599*u5
+
+def _DeltaTPiece12(y: Any) -> Any:
+    u = y - 2000
+    return 62.92 + 0.32217*u + 0.005589*u*u
+
+def _DeltaTPiece13(y: Any) -> Any:
+    u = (y-1820)/100
+    return -20 + 32*u*u - 0.5628*(2150 - y)
+
+_DELTA_T_PIECES = [
+    (-500.0, _DeltaTPiece0),
+    (500.0, _DeltaTPiece1),
+    (1600.0, _DeltaTPiece2),
+    (1700.0, _DeltaTPiece3),
+    (1800.0, _DeltaTPiece4),
+    (1860.0, _DeltaTPiece5),
+    (1900.0, _DeltaTPiece6),
+    (1920.0, _DeltaTPiece7),
+    (1941.0, _DeltaTPiece8),
+    (1961.0, _DeltaTPiece9),
+    (1986.0, _DeltaTPiece10),
+    (2005.0, _DeltaTPiece11),
+    (2050.0, _DeltaTPiece12),
+    (2150.0, _DeltaTPiece13),
+    (math.inf, _DeltaTPiece0),      # all years after 2150
+]
+# Finite bounds only: later years (and NaN) select the last piece, as in the if chain they replace
+_DELTA_T_BOUNDS = [upper for upper, _ in _DELTA_T_PIECES[:-1]]
+
+
 def DeltaT_EspenakMeeus(ut: float) -> float:
     """The default Delta T function used by Astronomy Engine.
 
@@ -185,77 +277,7 @@ def DeltaT_EspenakMeeus(ut: float) -> float:
     # to mean tropical years.
 
     y = 2000 + ((ut - 14) / _DAYS_PER_TROPICAL_YEAR)
-
-    if y < -500:
-        u = (y - 1820) / 100
-        return -20 + (32 * u*u)
-
-    if y < 500:
-        u = y / 100
-        u2 = u*u; u3 = u*u2; u4 = u2*u2; u5 = u2*u3; u6 = u3*u3
-        return 10583.6 - 1014.41*u + 33.78311*u2 - 5.952053*u3 - 0.1798452*u4 + 0.022174192*u5 + 0.0090316521*u6
-
-    if y < 1600:
-        u = (y - 1000) / 100
-        u2 = u*u; u3 = u*u2; u4 = u2*u2; u5 = u2*u3; u6 = u3*u3
-        return 1574.2 - 556.01*u + 71.23472*u2 + 0.319781*u3 - 0.8503463*u4 - 0.005050998*u5 + 0.0083572073*u6
-
-    if y < 1700:
-        u = y - 1600
-        u2 = u*u; u3 = u*u2
-        return 120 - 0.9808*u - 0.01532*u2 + u3/7129.0
-
-    if y < 1800:
-        u = y - 1700
-        u2 = u*u; u3 = u*u2; u4 = u2*u2
-        return 8.83 + 0.1603*u - 0.0059285*u2 + 0.00013336*u3 - u4/1174000
-
-    if y < 1860:
-        u = y - 1800
-        u2 = u*u; u3 = u*u2; u4 = u2*u2; u5 = u2*u3; u6 = u3*u3; u7 = u3*u4
-        return 13.72 - 0.332447*u + 0.0068612*u2 + 0.0041116*u3 - 0.00037436*u4 + 0.0000121272*u5 - 0.0000001699*u6 + 0.000000000875*u7
-
-    if y < 1900:
-        u = y - 1860
-        u2 = u*u; u3 = u*u2; u4 = u2*u2; u5 = u2*u3
-        return 7.62 + 0.5737*u - 0.251754*u2 + 0.01680668*u3 - 0.0004473624*u4 + u5/233174
-
-    if y < 1920:
-        u = y - 1900
-        u2 = u*u; u3 = u*u2; u4 = u2*u2
-        return -2.79 + 1.494119*u - 0.0598939*u2 + 0.0061966*u3 - 0.000197*u4
-
-    if y < 1941:
-        u = y - 1920
-        u2 = u*u; u3 = u*u2
-        return 21.20 + 0.84493*u - 0.076100*u2 + 0.0020936*u3
-
-    if y < 1961:
-        u = y - 1950
-        u2 = u*u; u3 = u*u2
-        return 29.07 + 0.407*u - u2/233 + u3/2547
-
-    if y < 1986:
-        u = y - 1975
-        u2 = u*u; u3 = u*u2
-        return 45.45 + 1.067*u - u2/260 - u3/718
-
-    if y < 2005:
-        u = y - 2000
-        u2 = u*u; u3 = u*u2; u4 = u2*u2; u5 = u2*u3
-        return 63.86 + 0.3345*u - 0.060374*u2 + 0.0017275*u3 + 0.000651814*u4 + 0.00002373599*u5
-
-    if y < 2050:
-        u = y - 2000
-        return 62.92 + 0.32217*u + 0.005589*u*u
-
-    if y < 2150:
-        u = (y-1820)/100
-        return -20 + 32*u*u - 0.5628*(2150 - y)
-
-    # all years after 2150
-    u = (y - 1820) / 100
-    return -20 + (32 * u*u)
+    return _DELTA_T_PIECES[bisect.bisect_right(_DELTA_T_BOUNDS, y)][1](y)
 
 
 _DeltaT = DeltaT_EspenakMeeus
@@ -278,6 +300,39 @@ def _UniversalTime(tt: float) -> float:
             return ut
         dt += err
 
+def _DeltaTArray(ut: Any) -> Any:
+    """Vectorized `_DeltaT`, in seconds, for an array of UT days."""
+    ut = numpy.asarray(ut, dtype=float)
+    if _DeltaT is not DeltaT_EspenakMeeus:
+        return numpy.vectorize(_DeltaT, otypes=[float])(ut)
+    y = 2000 + ((ut - 14) / _DAYS_PER_TROPICAL_YEAR)
+    dt = numpy.empty_like(y)
+    lower = -math.inf
+    for upper, piece in _DELTA_T_PIECES:
+        mask = (y >= lower) & (y < upper)
+        if mask.any():
+            dt[mask] = piece(y[mask])
+        lower = upper
+    return dt
+
+def _TerrestrialTimeArray(ut: Any) -> Any:
+    return ut + _DeltaTArray(ut) / 86400.0
+
+def _UniversalTimeArray(tt: Any) -> Any:
+    # Same solver as _UniversalTime, each element stopping at the same iteration.
+    tt = numpy.asarray(tt, dtype=float)
+    dt = _TerrestrialTimeArray(tt) - tt
+    ut = tt - dt
+    active = numpy.flatnonzero(numpy.ones(tt.shape, dtype=bool))
+    while len(active):
+        dt_active = dt.flat[active]
+        ut.flat[active] = tt.flat[active] - dt_active
+        err = _TerrestrialTimeArray(ut.flat[active]) - tt.flat[active]
+        moving = numpy.abs(err) >= 1.0e-12
+        dt.flat[active[moving]] = dt_active[moving] + err[moving]
+        active = active[moving]
+    return ut
+
 _TimeRegex = re.compile(r'^([\+\-]?[0-9]+)-([0-9]{2})-([0-9]{2})(T([0-9]{2}):([0-9]{2})(:([0-9]{2}(\.[0-9]+)?))?Z)?$')
 
 class Time:
@@ -324,6 +379,8 @@ class Time:
         such as the orbits of planets around the Sun, or the Moon around the Earth.
         Historically, Terrestrial Time has also been known by the term *Ephemeris Time* (ET).
     """
+    __slots__ = ('ut', 'tt', '_et', '_st')
+
     def __init__(self, ut : Union[float, str], tt: Optional[float] = None):
         if isinstance(ut, str):
             # Undocumented hack, to make repr(time) reversible.
@@ -569,6 +626,86 @@ class Time:
         return self.tt >= other.tt
 
 
+class TimeArray:
+    """Represents many dates and times at once, as arrays.
+
+    This is the array counterpart of #Time for vectorized calculations:
+    Delta T, sidereal time, nutation and precession are evaluated for all
+    the times in one pass with NumPy, without creating a #Time object per time.
+
+    Parameters
+    ----------
+    ut : array_like of float
+        UT1/UTC numbers of days since noon on January 1, 2000.
+    tt : array_like of float, optional
+        Terrestrial Time days since noon on January 1, 2000.
+        If omitted, they are calculated from `ut` with the Delta T model.
+
+    Attributes
+    ----------
+    ut : numpy.ndarray
+        The Universal Time days, as in the `ut` attribute of #Time.
+    tt : numpy.ndarray
+        The Terrestrial Time days, as in the `tt` attribute of #Time.
+    """
+    def __init__(self, ut: Any, tt: Any = None) -> None:
+        self.ut = numpy.array(ut, dtype=float, ndmin=1)
+        if tt is None:
+            self.tt = _TerrestrialTimeArray(self.ut)
+        else:
+            self.tt = numpy.array(numpy.broadcast_to(tt, self.ut.shape), dtype=float)
+        self._et: Optional[_e_tilt_array] = None     # lazy-cache for earth tilt
+        self._st: Optional[Any] = None                # lazy-cache for sidereal time
+
+    @staticmethod
+    def FromTimes(times: Any) -> "TimeArray":
+        """Creates a #TimeArray from a sequence of #Time objects, or returns a #TimeArray unchanged."""
+        if isinstance(times, TimeArray):
+            return times
+        times = list(times)
+        return TimeArray([time.ut for time in times], [time.tt for time in times])
+
+    @staticmethod
+    def FromTerrestrialTime(tt: Any) -> "TimeArray":
+        """Creates a #TimeArray from Terrestrial Time day values.
+
+        Parameters
+        ----------
+        tt : array_like of float
+            The numbers of days after the J2000 epoch.
+
+        Returns
+        -------
+        TimeArray
+        """
+        tt = numpy.array(tt, dtype=float, ndmin=1)
+        return TimeArray(_UniversalTimeArray(tt), tt)
+
+    def AddDays(self, days: Any) -> "TimeArray":
+        """Returns the times shifted by a real number of days, as #Time.AddDays does."""
+        return TimeArray(self.ut + days)
+
+    def __len__(self) -> int:
+        return len(self.ut)
+
+    def __getitem__(self, index: Any) -> Union[Time, "TimeArray"]:
+        if numpy.ndim(self.ut[index]) == 0:
+            return Time(float(self.ut[index]), float(self.tt[index]))
+        return TimeArray(self.ut[index], self.tt[index])
+
+    def __iter__(self) -> Any:
+        for ut, tt in zip(self.ut.tolist(), self.tt.tolist()):
+            yield Time(ut, tt)
+
+    def __repr__(self) -> str:
+        return 'TimeArray({} times)'.format(len(self))
+
+    def _etilt(self) -> "_e_tilt_array":
+        if self._et is None:
+            self._et = _e_tilt_array(self.tt)
+        return self._et
+
+
 class Vector:
     """A Cartesian vector with 3 space coordinates and 1 time coordinate.
 
@@ -587,6 +724,8 @@ class Vector:
     t : Time
         The date and time at which the coordinate is valid.
     """
+    __slots__ = ('x', 'y', 'z', 't')
+
     def __init__(self, x: float, y: float, z: float, t: Time) -> None:
         self.x = x
         self.y = y
@@ -644,6 +783,8 @@ class StateVector:
     t : Time
         The date and time at which the position and velocity vectors are valid.
     """
+    __slots__ = ('x', 'y', 'z', 'vx', 'vy', 'vz', 't')
+
     def __init__(self, x: float, y: float, z: float, vx: float, vy: float, vz: float, t: Time) -> None:
         self.x = x
         self.y = y
@@ -999,6 +1140,8 @@ class Observer:
     height : float
         Elevation above sea level in meters.
     """
+    __slots__ = ('latitude', 'longitude', 'height')
+
     def __init__(self, latitude: float, longitude: float, height: float = 0.0) -> None:
         self.latitude = latitude
         self.longitude = longitude
@@ -1112,6 +1255,50 @@ class _e_tilt:
         self.tt = time.tt
         self.ee = e.dpsi * math.cos(math.radians(self.mobl)) / 15.0
 
+class _e_tilt_array:
+    """Vectorized `_e_tilt` (with the IAU 2000B nutation) for an array of terrestrial times."""
+    def __init__(self, tt: Any) -> None:
+        t = tt / 36525.0
+        elp = numpy.fmod((1287104.79305 + t*129596581.0481),  _ASEC360) * _ASEC2RAD
+        f   = numpy.fmod((335779.526232 + t*1739527262.8478), _ASEC360) * _ASEC2RAD
+        d   = numpy.fmod((1072260.70369 + t*1602961601.2090), _ASEC360) * _ASEC2RAD
+        om  = numpy.fmod((450160.398036 - t*6962890.5431),    _ASEC360) * _ASEC2RAD
+
+        sarg = numpy.sin(om)
+        carg = numpy.cos(om)
+        dp = (-172064161.0 - 174666.0*t)*sarg + 33386.0*carg
+        de = (92052331.0 + 9086.0*t)*carg + 15377.0*sarg
+
+        arg = 2.0*(f - d + om)
+        sarg = numpy.sin(arg)
+        carg = numpy.cos(arg)
+        dp += (-13170906.0 - 1675.0*t)*sarg - 13696.0*carg
+        de += (5730336.0 - 3015.0*t)*carg - 4587.0*sarg
+
+        arg = 2.0*(f + om)
+        sarg = numpy.sin(arg)
+        carg = numpy.cos(arg)
+        dp += (-2276413.0 - 234.0*t)*sarg + 2796.0*carg
+        de += (978459.0 - 485.0*t)*carg + 1374.0*sarg
+
+        arg = 2.0*om
+        sarg = numpy.sin(arg)
+        carg = numpy.cos(arg)
+        dp += (2074554.0 + 207.0*t)*sarg - 698.0*carg
+        de += (-897492.0 + 470.0*t)*carg - 291.0*sarg
+
+        sarg = numpy.sin(elp)
+        carg = numpy.cos(elp)
+        dp += (1475877.0 - 3633.0*t)*sarg + 11817.0*carg
+        de += (73871.0 - 184.0*t)*carg - 1924.0*sarg
+
+        self.dpsi = -0.000135 + (dp * 1.0e-7)
+        self.deps = +0.000388 + (de * 1.0e-7)
+        self.mobl = _mean_obliq(tt)
+        self.tobl = self.mobl + (self.deps / 3600.0)
+        self.tt = tt
+        self.ee = self.dpsi * numpy.cos(numpy.radians(self.mobl)) / 15.0
+
 def _obl_ecl2equ_vec(obl_deg: float, ecl: List[float]) -> List[float]:
     obl_rad = math.radians(obl_deg)
     cos_obl = math.cos(obl_rad)
@@ -1188,6 +1375,59 @@ def _precession_rot(time: Time, direction: _PrecessDir) -> RotationMatrix:
 
     raise Error('Inalid precession direction')
 
+def _precession_rot_array(tt: Any, direction: _PrecessDir) -> Any:
+    """Vectorized `_precession_rot`: an array of shape (n, 3, 3) laid out as `RotationMatrix.rot`."""
+    eps0 = 84381.406
+    t = numpy.asarray(tt, dtype=float) / 36525
+
+    psia  = (((((-    0.0000000951  * t
+                 +    0.000132851 ) * t
+                 -    0.00114045  ) * t
+                 -    1.0790069   ) * t
+                 + 5038.481507    ) * t)
+
+    omegaa = (((((+   0.0000003337  * t
+                 -    0.000000467 ) * t
+                 -    0.00772503  ) * t
+                 +    0.0512623   ) * t
+                 -    0.025754    ) * t + eps0)
+
+    chia  = (((((-    0.0000000560  * t
+                 +    0.000170663 ) * t
+                 -    0.00121197  ) * t
+                 -    2.3814292   ) * t
+                 +   10.556403    ) * t)
+
+    eps0 *= _ASEC2RAD
+    psia = psia * _ASEC2RAD
+    omegaa = omegaa * _ASEC2RAD
+    chia = chia * _ASEC2RAD
+
+    sa = math.sin(eps0)
+    ca = math.cos(eps0)
+    sb = numpy.sin(-psia)
+    cb = numpy.cos(-psia)
+    sc = numpy.sin(-omegaa)
+    cc = numpy.cos(-omegaa)
+    sd = numpy.sin(chia)
+    cd = numpy.cos(chia)
+
+    rot = numpy.empty(t.shape + (3, 3))
+    rot[..., 0, 0] =  cd * cb - sb * sd * cc
+    rot[..., 0, 1] =  cd * sb * ca + sd * cc * cb * ca - sa * sd * sc
+    rot[..., 0, 2] =  cd * sb * sa + sd * cc * cb * sa + ca * sd * sc
+    rot[..., 1, 0] = -sd * cb - sb * cd * cc
+    rot[..., 1, 1] = -sd * sb * ca + cd * cc * cb * ca - sa * cd * sc
+    rot[..., 1, 2] = -sd * sb * sa + cd * cc * cb * sa + ca * cd * sc
+    rot[..., 2, 0] =  sb * sc
+    rot[..., 2, 1] = -sc * cb * ca - sa * cc
+    rot[..., 2, 2] = -sc * cb * sa + cc * ca
+    if direction == _PrecessDir.Into2000:
+        return rot
+    if direction == _PrecessDir.From2000:
+        return numpy.swapaxes(rot, -1, -2)
+    raise Error('Inalid precession direction')
+
 def _rotate(rot: RotationMatrix, vec: List[float]) -> List[float]:
     return [
         rot.rot[0][0]*vec[0] + rot.rot[1][0]*vec[1] + rot.rot[2][0]*vec[2],
@@ -1206,6 +1446,7 @@ def _precession_posvel(state: StateVector, time: Time, direction: _PrecessDir) -
 
 class _TerseVector:
     '''A 3D vector that is not attached to a time. Used privately inside this module for conciseness.'''
+    __slots__ = ('x', 'y', 'z')
 
     def __init__(self, x: float, y: float, z: float) -> None:
         self.x = x
@@ -1351,6 +1592,40 @@ def _nutation_posvel(state: StateVector, time: Time, direction: _PrecessDir) ->
     r = _nutation_rot(time, direction)
     return RotateState(r, state)
 
+def _nutation_rot_array(times: TimeArray, direction: _PrecessDir) -> Any:
+    """Vectorized `_nutation_rot`: an array of shape (n, 3, 3) laid out as `RotationMatrix.rot`."""
+    tilt = times._etilt()
+    oblm = numpy.radians(tilt.mobl)
+    oblt = numpy.radians(tilt.tobl)
+    psi = tilt.dpsi * _ASEC2RAD
+    cobm = numpy.cos(oblm)
+    sobm = numpy.sin(oblm)
+    cobt = numpy.cos(oblt)
+    sobt = numpy.sin(oblt)
+    cpsi = numpy.cos(psi)
+    spsi = numpy.sin(psi)
+
+    rot = numpy.empty(psi.shape + (3, 3))
+    rot[..., 0, 0] = cpsi
+    rot[..., 1, 0] = -spsi * cobm
+    rot[..., 2, 0] = -spsi * sobm
+    rot[..., 0, 1] = spsi * cobt
+    rot[..., 1, 1] = cpsi * cobm * cobt + sobm * sobt
+    rot[..., 2, 1] = cpsi * sobm * cobt - cobm * sobt
+    rot[..., 0, 2] = spsi * sobt
+    rot[..., 1, 2] = cpsi * cobm * sobt - sobm * cobt
+    rot[..., 2, 2] = cpsi * sobm * sobt + cobm * cobt
+
+    if direction == _PrecessDir.From2000:
+        # convert J2000 to of-date
+        return rot
+
+    if direction == _PrecessDir.Into2000:
+        # convert of-date to J2000
+        return numpy.swapaxes(rot, -1, -2)
+
+    raise Error('Invalid nutation direction')
+
 def _era(time: Time) -> float:        # Earth Rotation Angle
     thet1 = 0.7790572732640 + 0.00273781191135448 * time.ut
     thet3 = math.fmod(time.ut, 1.0)
@@ -1406,6 +1681,42 @@ def SiderealTime(time: Time) -> float:
     # return sidereal hours in the half-open range [0, 24).
     return time._st
 
+def _era_array(ut: Any) -> Any:
+    thet1 = 0.7790572732640 + 0.00273781191135448 * ut
+    thet3 = numpy.fmod(ut, 1.0)
+    theta = 360.0 * numpy.fmod((thet1 + thet3), 1.0)
+    return numpy.where(theta < 0.0, theta + 360.0, theta)
+
+def SiderealTimeArray(times: TimeArray) -> Any:
+    """Calculates Greenwich Apparent Sidereal Time (GAST) for many times at once.
+
+    This is the vectorized version of #SiderealTime.
+
+    Parameters
+    ----------
+    times : TimeArray
+        The dates and times for which to find GAST.
+        The result is cached in `times`, as #SiderealTime does in a #Time.
+
+    Returns
+    -------
+    numpy.ndarray
+        GAST expressed in sidereal hours, in the half-open range [0, 24).
+    """
+    if times._st is None:
+        t = times.tt / 36525.0
+        eqeq = 15.0 * times._etilt().ee
+        theta = _era_array(times.ut)
+        st = (eqeq + 0.014506 +
+            (((( -    0.0000000368   * t
+                -    0.000029956  ) * t
+                -    0.00000044   ) * t
+                +    1.3915817    ) * t
+                + 4612.156534     ) * t)
+        gst = numpy.fmod((st/3600.0 + theta), 360.0) / 15.0
+        times._st = numpy.where(gst < 0.0, gst + 24.0, gst)
+    return times._st
+
 def _inverse_terra(ovec: List[float], st: float) -> Observer:
     # Convert from AU to kilometers
     x = ovec[0] * KM_PER_AU
@@ -1518,12 +1829,236 @@ def _Array1(xmin: int, xmax: int) -> Dict[int, complex]:
 def _Array2(xmin: int, xmax: int, ymin: int, ymax: int) -> Dict[int, Dict[int, complex]]:
     return dict((key, _Array1(ymin, ymax)) for key in range(xmin, 1+xmax))
 
+# Solar perturbation terms of the lunar theory. Each row holds the coefficients added to
+# DLAM, DS (sine terms), GAM1C and SINPI (cosine terms) in arcseconds, then the multiples
+# of L, LS, F and D in the argument of the term.
+_MOON_SOLAR_TERMS = (
+    (   13.902,     14.06,    -0.001,    0.2607,  0,  0,  0,  4),
+    (    0.403,     -4.01,     0.394,    0.0023,  0,  0,  0,  3),
+    ( 2369.912,   2373.36,     0.601,   28.2333,  0,  0,  0,  2),
+    ( -125.154,   -112.79,    -0.725,   -0.9781,  0,  0,  0,  1),
+    (    1.979,      6.98,    -0.445,    0.0433,  1,  0,  0,  4),
+    (  191.953,    192.72,     0.029,    3.0861,  1,  0,  0,  2),
+    (   -8.466,    -13.51,     0.455,   -0.1093,  1,  0,  0,  1),
+    (  22639.5,  22609.07,     0.079,  186.5398,  1,  0,  0,  0),
+    (   18.609,      3.59,    -0.094,    0.0118,  1,  0,  0, -1),
+    (-4586.465,  -4578.13,    -0.077,   34.3117,  1,  0,  0, -2),
+    (    3.215,      5.44,     0.192,   -0.0386,  1,  0,  0, -3),
+    (  -38.428,    -38.64,     0.001,    0.6008,  1,  0,  0, -4),
+    (   -0.393,     -1.43,    -0.092,    0.0086,  1,  0,  0, -6),
+    (   -0.289,     -1.59,     0.123,   -0.0053,  0,  1,  0,  4),
+    (   -24.42,     -25.1,      0.04,      -0.3,  0,  1,  0,  2),
+    (   18.023,     17.93,     0.007,    0.1494,  0,  1,  0,  1),
+    ( -668.146,   -126.98,    -1.302,   -0.3997,  0,  1,  0,  0),
+    (     0.56,      0.32,    -0.001,   -0.0037,  0,  1,  0, -1),
+    ( -165.145,   -165.06,     0.054,    1.9178,  0,  1,  0, -2),
+    (   -1.877,     -6.46,    -0.416,    0.0339,  0,  1,  0, -4),
+    (    0.213,      1.02,    -0.074,    0.0054,  2,  0,  0,  4),
+    (   14.387,     14.78,    -0.017,    0.2833,  2,  0,  0,  2),
+    (   -0.586,      -1.2,     0.054,     -0.01,  2,  0,  0,  1),
+    (  769.016,    767.96,     0.107,   10.1657,  2,  0,  0,  0),
+    (     1.75,      2.01,    -0.018,    0.0155,  2,  0,  0, -1),
+    ( -211.656,   -152.53,     5.679,   -0.3039,  2,  0,  0, -2),
+    (    1.225,      0.91,     -0.03,   -0.0088,  2,  0,  0, -3),
+    (  -30.773,    -34.07,    -0.308,    0.3722,  2,  0,  0, -4),
+    (    -0.57,      -1.4,    -0.074,    0.0109,  2,  0,  0, -6),
+    (   -2.921,    -11.75,     0.787,   -0.0484,  1,  1,  0,  2),
+    (    1.267,      1.52,    -0.022,    0.0164,  1,  1,  0,  1),
+    ( -109.673,   -115.18,     0.461,    -0.949,  1,  1,  0,  0),
+    ( -205.962,   -182.36,     2.056,    1.4437,  1,  1,  0, -2),
+    (    0.233,      0.36,     0.012,   -0.0025,  1,  1,  0, -3),
+    (   -4.391,     -9.66,    -0.471,    0.0673,  1,  1,  0, -4),
+    (    0.283,      1.53,    -0.111,     0.006,  1, -1,  0,  4),
+    (   14.577,      31.7,     -1.54,    0.2302,  1, -1,  0,  2),
+    (  147.687,    138.76,     0.679,    1.1528,  1, -1,  0,  0),
+    (   -1.089,      0.55,     0.021,       0.0,  1, -1,  0, -1),
+    (   28.475,     23.59,    -0.443,   -0.2257,  1, -1,  0, -2),
+    (   -0.276,     -0.38,    -0.006,   -0.0036,  1, -1,  0, -3),
+    (    0.636,      2.27,     0.146,   -0.0102,  1, -1,  0, -4),
+    (   -0.189,     -1.68,     0.131,   -0.0028,  0,  2,  0,  2),
+    (   -7.486,     -0.66,    -0.037,   -0.0086,  0,  2,  0,  0),
+    (   -8.096,    -16.35,     -0.74,    0.0918,  0,  2,  0, -2),
+    (   -5.741,     -0.04,       0.0,   -0.0009,  0,  0,  2,  2),
+    (    0.255,       0.0,       0.0,       0.0,  0,  0,  2,  1),
+    ( -411.608,      -0.2,       0.0,   -0.0124,  0,  0,  2,  0),
+    (    0.584,      0.84,       0.0,    0.0071,  0,  0,  2, -1),
+    (  -55.173,    -52.14,       0.0,   -0.1052,  0,  0,  2, -2),
+    (    0.254,      0.25,       0.0,   -0.0017,  0,  0,  2, -3),
+    (    0.025,     -1.67,       0.0,    0.0031,  0,  0,  2, -4),
+    (     1.06,      2.96,    -0.166,    0.0243,  3,  0,  0,  2),
+    (   36.124,     50.64,      -1.3,    0.6215,  3,  0,  0,  0),
+    (  -13.193,     -16.4,     0.258,   -0.1187,  3,  0,  0, -2),
+    (   -1.187,     -0.74,     0.042,    0.0074,  3,  0,  0, -4),
+    (   -0.293,     -0.31,    -0.002,    0.0046,  3,  0,  0, -6),
+    (    -0.29,     -1.45,     0.116,   -0.0051,  2,  1,  0,  2),
+    (   -7.649,    -10.56,     0.259,   -0.1038,  2,  1,  0,  0),
+    (   -8.627,     -7.59,     0.078,   -0.0192,  2,  1,  0, -2),
+    (    -2.74,     -2.54,     0.022,    0.0324,  2,  1,  0, -4),
+    (    1.181,      3.32,    -0.212,    0.0213,  2, -1,  0,  2),
+    (    9.703,     11.67,    -0.151,    0.1268,  2, -1,  0,  0),
+    (   -0.352,     -0.37,     0.001,   -0.0028,  2, -1,  0, -1),
+    (   -2.494,     -1.17,    -0.003,   -0.0017,  2, -1,  0, -2),
+    (     0.36,       0.2,    -0.012,   -0.0043,  2, -1,  0, -4),
+    (   -1.167,     -1.25,     0.008,   -0.0106,  1,  2,  0,  0),
+    (   -7.412,     -6.12,     0.117,    0.0484,  1,  2,  0, -2),
+    (   -0.311,     -0.65,    -0.032,    0.0044,  1,  2,  0, -4),
+    (    0.757,      1.82,    -0.105,    0.0112,  1, -2,  0,  2),
+    (     2.58,      2.32,     0.027,    0.0196,  1, -2,  0,  0),
+    (    2.533,       2.4,    -0.014,   -0.0212,  1, -2,  0, -2),
+    (   -0.344,     -0.57,    -0.025,    0.0036,  0,  3,  0, -2),
+    (   -0.992,     -0.02,       0.0,       0.0,  1,  0,  2,  2),
+    (  -45.099,     -0.02,       0.0,    -0.001,  1,  0,  2,  0),
+    (   -0.179,     -9.52,       0.0,   -0.0833,  1,  0,  2, -2),
+    (   -0.301,     -0.33,       0.0,    0.0014,  1,  0,  2, -4),
+    (   -6.382,     -3.37,       0.0,   -0.0481,  1,  0, -2,  2),
+    (   39.528,     85.13,       0.0,   -0.7136,  1,  0, -2,  0),
+    (    9.366,      0.71,       0.0,   -0.0112,  1,  0, -2, -2),
+    (    0.202,      0.02,       0.0,       0.0,  1,  0, -2, -4),
+    (    0.415,       0.1,       0.0,    0.0013,  0,  1,  2,  0),
+    (   -2.152,     -2.26,       0.0,   -0.0066,  0,  1,  2, -2),
+    (    -1.44,      -1.3,       0.0,    0.0014,  0,  1, -2,  2),
+    (    0.384,     -0.04,       0.0,       0.0,  0,  1, -2, -2),
+    (    1.938,       3.6,    -0.145,    0.0401,  4,  0,  0,  0),
+    (   -0.952,     -1.58,     0.052,    -0.013,  4,  0,  0, -2),
+    (   -0.551,     -0.94,     0.032,   -0.0097,  3,  1,  0,  0),
+    (   -0.482,     -0.57,     0.005,   -0.0045,  3,  1,  0, -2),
+    (    0.681,      0.96,    -0.026,    0.0115,  3, -1,  0,  0),
+    (   -0.297,     -0.27,     0.002,   -0.0009,  2,  2,  0, -2),
+    (    0.254,      0.21,    -0.003,       0.0,  2, -2,  0, -2),
+    (    -0.25,     -0.22,     0.004,    0.0014,  1,  3,  0, -2),
+    (   -3.996,       0.0,       0.0,    0.0004,  2,  0,  2,  0),
+    (    0.557,     -0.75,       0.0,    -0.009,  2,  0,  2, -2),
+    (   -0.459,     -0.38,       0.0,   -0.0053,  2,  0, -2,  2),
+    (   -1.298,      0.74,       0.0,    0.0004,  2,  0, -2,  0),
+    (    0.538,      1.14,       0.0,   -0.0141,  2,  0, -2, -2),
+    (    0.263,      0.02,       0.0,       0.0,  1,  1,  2,  0),
+    (    0.426,      0.07,       0.0,   -0.0006,  1,  1, -2, -2),
+    (   -0.304,      0.03,       0.0,    0.0003,  1, -1,  2,  0),
+    (   -0.372,     -0.19,       0.0,   -0.0027,  1, -1, -2,  2),
+    (    0.418,       0.0,       0.0,       0.0,  0,  0,  4,  0),
+    (    -0.33,     -0.04,       0.0,       0.0,  3,  0,  2,  0),
+)
+
+# Terms of N (latitude perturbations): coefficient in arcseconds, then multiples of L, LS, F and D.
+_MOON_N_TERMS = (
+    (-526.069,  0,  0,  1, -2),
+    (  -3.352,  0,  0,  1, -4),
+    ( +44.297, +1,  0,  1, -2),
+    (  -6.000, +1,  0,  1, -4),
+    ( +20.599, -1,  0,  1,  0),
+    ( -30.598, -1,  0,  1, -2),
+    ( -24.649, -2,  0,  1,  0),
+    (  -2.000, -2,  0,  1, -2),
+    ( -22.571,  0, +1,  1, -2),
+    ( +10.985,  0, -1,  1, -2),
+)
+
+# Long-period terms of DLAM: coefficient in arcseconds, then phase and rate (per Julian century) in revolutions.
+_MOON_DLAM_TERMS = (
+    (0.82, 0.7736,   -62.5512),
+    (0.31, 0.0466,  -125.1025),
+    (0.35, 0.5785,   -25.1042),
+    (0.66, 0.4591, +1335.8075),
+    (0.64, 0.3130,   -91.5680),
+    (1.14, 0.1480, +1331.2898),
+    (0.21, 0.5918, +1056.5859),
+    (0.44, 0.5784, +1322.8595),
+    (0.24, 0.2275,    -5.7374),
+    (0.28, 0.2965,    +2.6929),
+    (0.33, 0.3132,    +6.3368),
+)
+
+_MoonTablesCache = None
+
+def _MoonTables() -> Tuple[Any, Any, Any, Any, Any, Any]:
+    """Pack the lunar series as NumPy arrays, once."""
+    global _MoonTablesCache
+    if _MoonTablesCache is None:
+        solar = numpy.array(_MOON_SOLAR_TERMS)
+        nterms = numpy.array(_MOON_N_TERMS)
+        dlam = numpy.array(_MOON_DLAM_TERMS)
+        _MoonTablesCache = (
+            solar[:, :4].T.copy(),          # coefficients of DLAM, DS, GAM1C, SINPI
+            solar[:, 4:],                   # multiples of L, LS, F, D
+            nterms[:, 0],
+            nterms[:, 1:],
+            dlam[:, 0],
+            dlam[:, 1:].T.copy()
+        )
+    return _MoonTablesCache
+
 class _moonpos:
     def __init__(self, lon: float, lat: float, dist: float) -> None:
         self.geo_eclip_lon = lon
         self.geo_eclip_lat = lat
         self.distance_au = dist
 
+def _CalcMoonArray(tt: Any) -> _moonpos:
+    """Evaluate the lunar theory for an array of terrestrial times, all at once.
+
+    Each series term is the product of powers of (FAC * exp(i*ARG)) for the arguments
+    L, LS, F and D, i.e. a sine or cosine of a linear combination of the arguments
+    scaled by the matching powers of the FAC factors. `_CalcMoon` keeps the unrolled
+    scalar form, which is faster for a single time.
+    """
+    solar_coeff, solar_mult, n_coeff, n_mult, dlam_coeff, dlam_arg = _MoonTables()
+
+    def Sine(phi: Any) -> Any:
+        return numpy.sin(_PI2 * phi)
+
+    def Frac(x: Any) -> Any:
+        return x - numpy.floor(x)
+
+    T = numpy.atleast_1d(numpy.asarray(tt, dtype=float)) / 36525
+    T2 = T*T
+    S1 = Sine(0.19833+0.05611*T)
+    S2 = Sine(0.27869+0.04508*T)
+    S3 = Sine(0.16827-0.36903*T)
+    S4 = Sine(0.34734-5.37261*T)
+    S5 = Sine(0.10498-5.37899*T)
+    S6 = Sine(0.42681-0.41855*T)
+    S7 = Sine(0.14943-5.37511*T)
+    DL0 = 0.84*S1+0.31*S2+14.27*S3+ 7.26*S4+ 0.28*S5+0.24*S6
+    DL  = 2.94*S1+0.31*S2+14.27*S3+ 9.34*S4+ 1.12*S5+0.83*S6
+    DLS =-6.40*S1                                   -1.89*S6
+    DF  = 0.21*S1+0.31*S2+14.27*S3-88.70*S4-15.30*S5+0.24*S6-1.86*S7
+    DD  = DL0-DLS
+    DGAM  = ((-3332E-9 * Sine(0.59734-5.37261*T)
+               -539E-9 * Sine(0.35498-5.37899*T)
+                -64E-9 * Sine(0.39943-5.37511*T)))
+
+    L0 = _PI2*Frac(0.60643382+1336.85522467*T-0.00000313*T2) + DL0/_ARC
+    L  = _PI2*Frac(0.37489701+1325.55240982*T+0.00002565*T2) + DL /_ARC
+    LS = _PI2*Frac(0.99312619+  99.99735956*T-0.00000044*T2) + DLS/_ARC
+    F  = _PI2*Frac(0.25909118+1342.22782980*T-0.00000892*T2) + DF /_ARC
+    D  = _PI2*Frac(0.82736186+1236.85308708*T-0.00000397*T2) + DD /_ARC
+
+    ARG = numpy.stack([L, LS, F, D])
+    FAC = numpy.stack([
+        numpy.full_like(T, 1.000002208),
+        0.997504612-0.002495388*T,
+        1.000002708+139.978*DGAM,
+        numpy.ones_like(T)
+    ])
+
+    # Solar perturbations: sine terms for DLAM and DS, cosine terms for GAM1C and SINPI
+    phase = solar_mult @ ARG
+    amplitude = numpy.exp(numpy.abs(solar_mult) @ numpy.log(FAC))
+    DLAM, DS = solar_coeff[:2] @ (amplitude * numpy.sin(phase))
+    GAM1C, SINPI = solar_coeff[2:] @ (amplitude * numpy.cos(phase))
+    SINPI = SINPI + 3422.7000
+
+    N = n_coeff @ (numpy.exp(numpy.abs(n_mult) @ numpy.log(FAC)) * numpy.sin(n_mult @ ARG))
+    DLAM = DLAM + dlam_coeff @ Sine(dlam_arg[0][:, None] + dlam_arg[1][:, None] * T)
+
+    S = F + DS/_ARC
+    lat_seconds = (1.000002708 + 139.978*DGAM)*(18518.511+1.189+GAM1C)*numpy.sin(S) - 6.24*numpy.sin(3*S) + N
+    return _moonpos(
+        _PI2 * Frac((L0+DLAM/_ARC) / _PI2),
+        (math.pi / (180 * 3600)) * lat_seconds,
+        (_ARC * _EARTH_EQUATORIAL_RADIUS_AU) / (0.999953253 * SINPI)
+    )
+
 def _CalcMoon(time: Time) -> _moonpos:
     T = time.tt / 36525
     ex = _Array2(-6, 6, 1, 4)
@@ -2308,6 +2843,26 @@ def _CalcMoon(time: Time) -> _moonpos:
         (_ARC * _EARTH_EQUATORIAL_RADIUS_AU) / (0.999953253 * SINPI)
     )
 
+_EphemerisCache: Any = None
+
+def SetEphemerisCache(cache: Any) -> None:
+    """Routes the geocentric Moon and Sun positions through a precomputed ephemeris.
+
+    Once set, #GeoMoon and #GeoVector for the Sun (and every function built on them,
+    such as #Equator and #SearchRiseSet) ask the cache first, and fall back to the
+    analytic theories for times it does not cover.
+
+    Parameters
+    ----------
+    cache : object or None
+        An object with the methods `GeoMoon(time)` and `GeoSun(time, aberration)`
+        returning a #Vector, or None when the time is not covered.
+        Pass None to always use the analytic theories again.
+    """
+    global _EphemerisCache
+    _EphemerisCache = cache
+
+
 def GeoMoon(time: Time) -> Vector:
     """Calculates equatorial geocentric position of the Moon at a given time.
 
@@ -2333,6 +2888,11 @@ def GeoMoon(time: Time) -> Vector:
     Vector
         The Moon's position as a vector in J2000 Cartesian equatorial coordinates (EQJ).
     """
+    if _EphemerisCache is not None:
+        vec = _EphemerisCache.GeoMoon(time)
+        if vec is not None:
+            return vec
+
     m = _CalcMoon(time)
 
     # Convert geocentric ecliptic spherical coordinates to Cartesian coordinates.
@@ -2351,6 +2911,43 @@ def GeoMoon(time: Time) -> Vector:
     return Vector(mpos2[0], mpos2[1], mpos2[2], time)
 
 
+def GeoMoonBatch(times: Any) -> Any:
+    """Calculates equatorial geocentric positions of the Moon at many times at once.
+
+    This is the vectorized version of #GeoMoon, evaluating the lunar series
+    for every time in one pass with NumPy.
+
+    Parameters
+    ----------
+    times : TimeArray or sequence of Time
+        The dates and times for which to calculate the Moon's position.
+
+    Returns
+    -------
+    numpy.ndarray
+        An array of shape (n, 3) holding the Moon's position vectors,
+        in AU, in J2000 Cartesian equatorial coordinates (EQJ).
+    """
+    tt = TimeArray.FromTimes(times).tt
+    m = _CalcMoonArray(tt)
+
+    # Convert geocentric ecliptic spherical coordinates to Cartesian coordinates.
+    dist_cos_lat = m.distance_au * numpy.cos(m.geo_eclip_lat)
+    x = dist_cos_lat * numpy.cos(m.geo_eclip_lon)
+    y = dist_cos_lat * numpy.sin(m.geo_eclip_lon)
+    z = m.distance_au * numpy.sin(m.geo_eclip_lat)
+
+    # Convert ecliptic coordinates to equatorial coordinates, both in mean equinox of date.
+    obl_rad = numpy.radians(_mean_obliq(tt))
+    cos_obl = numpy.cos(obl_rad)
+    sin_obl = numpy.sin(obl_rad)
+    mpos1 = numpy.stack([x, y*cos_obl - z*sin_obl, y*sin_obl + z*cos_obl], axis=-1)
+
+    # Convert from mean equinox of date to J2000.
+    rot = _precession_rot_array(tt, _PrecessDir.Into2000)
+    return numpy.einsum('nij,ni->nj', rot, mpos1)
+
+
 def EclipticGeoMoon(time: Time) -> Spherical:
     """Calculates spherical ecliptic geocentric position of the Moon.
 
@@ -3188,6 +3785,62 @@ def _CalcVsop(model: _vsop_model_t, time: Time) -> Vector:
     eclip = _VsopSphereToRect(lon, lat, rad)
     return _VsopRotate(eclip).ToAstroVector(time)
 
+_VsopTablesCache: Dict[int, Any] = {}
+
+def _VsopTables(model: _vsop_model_t) -> Any:
+    """Pack the lon, lat, rad formulas of a model as NumPy arrays, once per model.
+
+    Each formula becomes (phase, frequency, weights), where `weights` has one column per
+    series holding the amplitudes of its terms, so that the series sums for many times
+    are one matrix product.
+    """
+    key = id(model)
+    if key not in _VsopTablesCache:
+        tables = []
+        for formula in (model.lon, model.lat, model.rad):
+            terms = [term for series in formula.seriesList for term in series.termList]
+            weights = numpy.zeros((len(terms), len(formula.seriesList)))
+            start = 0
+            for s, series in enumerate(formula.seriesList):
+                stop = start + len(series.termList)
+                weights[start:stop, s] = [ampl for (ampl, _, _) in series.termList]
+                start = stop
+            packed = numpy.array(terms, dtype=float).reshape(-1, 3)
+            tables.append((packed[:, 1].copy(), packed[:, 2].copy(), weights))
+        _VsopTablesCache[key] = tables
+    return _VsopTablesCache[key]
+
+def _VsopFormulaArray(table: Any, t: Any, clamp_angle: bool) -> Any:
+    phase, freq, weights = table
+    sums = numpy.cos(phase + numpy.multiply.outer(t, freq)) @ weights
+    tpower = numpy.ones_like(t)
+    coord = numpy.zeros_like(t)
+    for s in range(weights.shape[1]):
+        incr = tpower * sums[..., s]
+        if clamp_angle:
+            incr = numpy.fmod(incr, _PI2)
+        coord += incr
+        tpower = tpower * t
+    return coord
+
+def _CalcVsopArray(model: _vsop_model_t, tt: Any) -> Any:
+    """Vectorized `_CalcVsop`: heliocentric EQJ positions of shape (n, 3) for an array of terrestrial times."""
+    lon_table, lat_table, rad_table = _VsopTables(model)
+    t = numpy.asarray(tt, dtype=float) / _DAYS_PER_MILLENNIUM
+    lon = _VsopFormulaArray(lon_table, t, True)
+    lat = _VsopFormulaArray(lat_table, t, False)
+    rad = _VsopFormulaArray(rad_table, t, False)
+    r_coslat = rad * numpy.cos(lat)
+    ex = r_coslat * numpy.cos(lon)
+    ey = r_coslat * numpy.sin(lon)
+    ez = rad * numpy.sin(lat)
+    # Same ecliptic to equatorial rotation as _VsopRotate.
+    return numpy.stack([
+        ex + 0.000000440360*ey - 0.000000190919*ez,
+        -0.000000479966*ex + 0.917482137087*ey - 0.397776982902*ez,
+        0.397776982902*ey + 0.917482137087*ez
+    ], axis=-1)
+
 class _body_state_t:
     def __init__(self, tt: float, r: _TerseVector, v: _TerseVector) -> None:
         self.tt  = tt
@@ -4360,6 +5013,11 @@ def GeoVector(body: Body, time: Time, aberration: bool) -> Vector:
     if body == Body.Earth:
         return Vector(0.0, 0.0, 0.0, time)
 
+    if body == Body.Sun and _EphemerisCache is not None:
+        vec = _EphemerisCache.GeoSun(time, aberration)
+        if vec is not None:
+            return vec
+
     # Correct for light-travel time, to get position of body as seen from Earth's center.
     vec = BackdatePosition(time, Body.Earth, body, aberration)
 
@@ -4368,6 +5026,47 @@ def GeoVector(body: Body, time: Time, aberration: bool) -> Vector:
     return vec
 
 
+def GeoSunBatch(times: Any, aberration: bool) -> Any:
+    """Calculates geocentric positions of the Sun at many times at once.
+
+    This is the vectorized version of `GeoVector(Body.Sun, time, aberration)`,
+    evaluating the Earth's VSOP87 series for every time in one pass with NumPy,
+    including the light travel time correction.
+
+    Parameters
+    ----------
+    times : TimeArray or sequence of Time
+        The dates and times for which to calculate the Sun's position.
+    aberration : bool
+        A boolean value indicating whether to correct for aberration.
+
+    Returns
+    -------
+    numpy.ndarray
+        An array of shape (n, 3) holding the Sun's position vectors,
+        in AU, in J2000 Cartesian equatorial coordinates (EQJ).
+    """
+    earth = _vsop[Body.Earth.value]
+    tt = TimeArray.FromTimes(times).tt
+    # The Sun is the origin of the heliocentric coordinates: only the Earth moves.
+    pos = -_CalcVsopArray(earth, tt)
+    if not aberration:
+        return pos
+    # Backdate the Earth position by the light travel time, as BackdatePosition does,
+    # stopping each time at the same iteration as the scalar solver.
+    ltime = tt.copy()
+    active = numpy.arange(len(tt))
+    for _ in range(10):
+        ltime2 = tt[active] - numpy.linalg.norm(pos[active], axis=-1) / C_AUDAY
+        moving = numpy.abs(ltime2 - ltime[active]) >= 1.0e-9
+        active, ltime2 = active[moving], ltime2[moving]
+        if len(active) == 0:
+            return pos
+        ltime[active] = ltime2
+        pos[active] = -_CalcVsopArray(earth, ltime[active])
+    raise NoConvergeError()
+
+
 def _ExportState(terse: _body_state_t, time: Time) -> StateVector:
     return StateVector(
         terse.r.x, terse.r.y, terse.r.z,
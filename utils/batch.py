@@ -0,0 +1,403 @@
+"""Vectorized version of `odeh.calculate` over arrays of instants and observers.
+
+Sun and Moon geocentric positions only depend on time: they are computed at once for
+the instants of a regular grid with the engine's array functions, then interpolated.
+Only the topocentric and horizontal parts, which depend on the observer, are evaluated
+with NumPy for all the observers at once.
+"""
+import math
+from typing import NamedTuple, Optional
+
+import numpy
+import utils.astronomy_ as astronomy
+from utils.odeh import (
+    KM_PER_AU, MOON_MEAN_RADIUS_KM, STATUS_OK, STATUS_NO_SET, STATUS_MOON_SETS_FIRST,
+    STATUS_CODES, VisibilityResultArray
+)
+
+GRID_STEP_DAYS = 1 / 144                # 10 minutes between two ephemeris samples
+SCAN_STEP_DAYS = 1 / 96                 # 15 minutes between two altitude probes of the set search
+TIME_TOLERANCE_DAYS = 0.01 / 86400      # set times are refined to 0.01 second
+MAX_REFINE_ITERATIONS = 40
+# Observers computed together: the set search holds about 14 KB per observer
+BLOCK_SIZE = 8192
+# Sun altitudes (degrees) of the twilight where a crescent can be sighted, for the peak of V
+PEAK_SUN_ALTITUDES = (-8.0, -3.0)
+
+_SUN_RADIUS_AU = 695700.0 / KM_PER_AU
+_MOON_EQUATORIAL_RADIUS_AU = 1738.1 / KM_PER_AU
+_EARTH_FLATTENING = 0.996647180302104
+_EARTH_EQUATORIAL_RADIUS_KM = 6378.1366
+_REFRACTION_NEAR_HORIZON = 34.0 / 60.0
+
+
+# Earth Rotation Angle in degrees, vectorized version of the engine's _era
+_era = astronomy._era_array
+
+
+def universal_times(times):
+    """Return UT days since J2000 from an `astronomy.TimeArray`, or an array of `astronomy.Time` or UT days."""
+    if isinstance(times, astronomy.TimeArray):
+        return times.ut
+    times = numpy.asarray(times, dtype=object)
+    return numpy.vectorize(lambda t: t.ut if isinstance(t, astronomy.Time) else float(t), otypes=[float])(times)
+
+
+class Ephemeris:
+    """Geocentric Sun and Moon vectors of date and sidereal time, sampled on a regular grid.
+
+    Values between the samples are obtained with 4-point Lagrange interpolation, whose
+    error is far below the precision of the engine for a 10-minute step.
+    """
+
+    def __init__(self, ut_start, ut_stop, step=GRID_STEP_DAYS):
+        count = int(math.ceil((ut_stop - ut_start) / step)) + 4
+        self.ut0 = ut_start - step
+        self.step = step
+        self.ut = self.ut0 + step * numpy.arange(count)
+        times = astronomy.TimeArray(self.ut)
+        # J2000 to equator and equinox of date: precession, then nutation
+        rotation = (astronomy._precession_rot_array(times.tt, astronomy._PrecessDir.From2000) @
+                    astronomy._nutation_rot_array(times, astronomy._PrecessDir.From2000))
+        self.sun = numpy.einsum("nij,ni->nj", rotation, astronomy.GeoSunBatch(times, True))
+        self.moon = numpy.einsum("nij,ni->nj", rotation, astronomy.GeoMoonBatch(times))
+        # Sidereal time minus the Earth Rotation Angle is smooth and small
+        offset = 15.0 * astronomy.SiderealTimeArray(times) - _era(self.ut)
+        self._gast_offset = (offset + 180.0) % 360.0 - 180.0
+
+    def _interpolate(self, values, ut):
+        u = (ut - self.ut0) / self.step
+        k = numpy.clip(numpy.floor(u).astype(int), 1, len(self.ut) - 3)
+        x = (u - k)[..., None] if values.ndim > 1 else u - k
+        return (
+            -x * (x - 1) * (x - 2) / 6 * values[k - 1] +
+            (x + 1) * (x - 1) * (x - 2) / 2 * values[k] -
+            (x + 1) * x * (x - 2) / 2 * values[k + 1] +
+            (x + 1) * x * (x - 1) / 6 * values[k + 2]
+        )
+
+    def sun_vector(self, ut):
+        return self._interpolate(self.sun, ut)
+
+    def moon_vector(self, ut):
+        return self._interpolate(self.moon, ut)
+
+    def sidereal_degrees(self, ut):
+        """Greenwich apparent sidereal time, in degrees."""
+        return _era(ut) + self._interpolate(self._gast_offset, ut)
+
+
+def observer_vector(latitude, longitude, height, sidereal_degrees):
+    """Geocentric observer position of date in AU, vectorized version of the engine's _terra."""
+    phi = numpy.radians(latitude)
+    sinphi = numpy.sin(phi)
+    cosphi = numpy.cos(phi)
+    c = 1.0 / numpy.hypot(cosphi, sinphi * _EARTH_FLATTENING)
+    s = _EARTH_FLATTENING ** 2 * c
+    ht_km = height / 1000.0
+    ach = _EARTH_EQUATORIAL_RADIUS_KM * c + ht_km
+    ash = _EARTH_EQUATORIAL_RADIUS_KM * s + ht_km
+    stlocl = numpy.radians(sidereal_degrees + longitude)
+    return numpy.stack(numpy.broadcast_arrays(
+        ach * cosphi * numpy.cos(stlocl) / KM_PER_AU,
+        ach * cosphi * numpy.sin(stlocl) / KM_PER_AU,
+        ash * sinphi / KM_PER_AU
+    ), axis=-1)
+
+
+def horizon(vec, latitude, longitude, sidereal_degrees):
+    """Airless altitude and azimuth in degrees of topocentric vectors of date, as `astronomy.Horizon`."""
+    latrad = numpy.radians(latitude)
+    sinlat = numpy.sin(latrad)
+    coslat = numpy.cos(latrad)
+    local = numpy.radians(sidereal_degrees + longitude)
+    sinlocal = numpy.sin(local)
+    coslocal = numpy.cos(local)
+    p = vec / numpy.linalg.norm(vec, axis=-1, keepdims=True)
+    pz = p[..., 0] * coslat * coslocal + p[..., 1] * coslat * sinlocal + p[..., 2] * sinlat
+    pn = -p[..., 0] * sinlat * coslocal - p[..., 1] * sinlat * sinlocal + p[..., 2] * coslat
+    pw = p[..., 0] * sinlocal - p[..., 1] * coslocal
+    proj = numpy.hypot(pn, pw)
+    azimuth = numpy.degrees(-numpy.arctan2(pw, pn))
+    azimuth = numpy.where(proj > 0.0, numpy.where(azimuth < 0, azimuth + 360, azimuth), 0.0)
+    altitude = 90.0 - numpy.degrees(numpy.arctan2(proj, pz))
+    return altitude, azimuth
+
+
+def angle_between(a, b):
+    """Angle in degrees between vectors, as `astronomy.AngleBetween`."""
+    r = numpy.linalg.norm(a, axis=-1) * numpy.linalg.norm(b, axis=-1)
+    dot = numpy.sum(a * b, axis=-1) / r
+    return numpy.degrees(numpy.arccos(numpy.clip(dot, -1.0, 1.0)))
+
+
+class _SetFunction:
+    """Altitude of the top of a body above the refracted horizon, for a batch of observers."""
+
+    def __init__(self, ephemeris, body_vector, body_radius_au, latitude, longitude, height, target_altitude):
+        self.ephemeris = ephemeris
+        self.body_vector = body_vector
+        self.body_radius_au = body_radius_au
+        self.latitude = latitude
+        self.longitude = longitude
+        self.height = height
+        self.target_altitude = target_altitude
+
+    def __call__(self, ut, index=slice(None)):
+        """Evaluate at `ut`, an array whose first axis runs over the observers in `index`."""
+        extra = (slice(None),) + (None,) * (ut.ndim - 1)
+        latitude = self.latitude[index][extra]
+        longitude = self.longitude[index][extra]
+        sidereal = self.ephemeris.sidereal_degrees(ut)
+        topo = self.body_vector(ut) - observer_vector(latitude, longitude, self.height[index][extra], sidereal)
+        altitude, _ = horizon(topo, latitude, longitude, sidereal)
+        dist = numpy.linalg.norm(topo, axis=-1)
+        return altitude + numpy.degrees(numpy.arcsin(self.body_radius_au / dist)) - self.target_altitude[index][extra]
+
+
+def refine_roots(function, a, b, fa, fb, tolerance):
+    """Find a root of `function` in each bracket `[a, b]`, where `fa` and `fb` differ in sign.
+
+    Illinois variant of the regula falsi, as used by `astronomy.Search`, vectorized over
+    the brackets: `function(x, index)` is called with the current estimates of the brackets
+    still being refined and their indices. Brackets where `function` is not finite give NaN.
+    """
+    a, b, fa, fb = (numpy.array(value, dtype=float) for value in (a, b, fa, fb))
+    side = numpy.zeros(len(a))
+    c = b.copy()
+    active = numpy.arange(len(a))
+    for _ in range(MAX_REFINE_ITERATIONS):
+        if len(active) == 0:
+            break
+        ca, cb, cfa, cfb, cside = a[active], b[active], fa[active], fb[active], side[active]
+        x = (ca * cfb - cb * cfa) / (cfb - cfa)
+        fx = function(x, active)
+        same = numpy.sign(fx) == numpy.sign(cfa)
+        a[active] = numpy.where(same, x, ca)
+        fa[active] = numpy.where(same, fx, numpy.where(cside < 0, cfa / 2, cfa))
+        b[active] = numpy.where(same, cb, x)
+        fb[active] = numpy.where(same, numpy.where(cside > 0, cfb / 2, cfb), fx)
+        side[active] = numpy.where(same, 1.0, -1.0)
+        c[active] = numpy.where(numpy.isfinite(fx), x, numpy.nan)
+        active = active[numpy.isfinite(fx) & (fx != 0) & (numpy.abs(b[active] - a[active]) >= tolerance)]
+    return c
+
+
+def _search_set(function, start_ut, limit_days=1.0):
+    """Find the first time after `start_ut` when `function` goes from positive to non-positive.
+
+    Mirrors `astronomy.SearchRiseSet(..., Direction.Set, start, limit_days)` for each observer,
+    returning NaN when the body does not set within the window.
+    """
+    steps = int(math.ceil(limit_days / SCAN_STEP_DAYS))
+    ut = start_ut[:, None] + SCAN_STEP_DAYS * numpy.arange(steps + 1)[None, :]
+    values = function(ut)
+    crossing = (values[:, :-1] > 0) & (values[:, 1:] <= 0)
+    found = numpy.flatnonzero(crossing.any(axis=1))
+    result = numpy.full(len(start_ut), numpy.nan)
+    if len(found) == 0:
+        return result
+
+    j = numpy.argmax(crossing[found], axis=1)
+    c = refine_roots(lambda ut, index: function(ut, found[index]), ut[found, j], ut[found, j + 1],
+                     values[found, j], values[found, j + 1], TIME_TOLERANCE_DAYS)
+
+    inside = c <= start_ut[found] + limit_days
+    result[found[inside]] = c[inside]
+    return result
+
+
+def geometry(ephemeris, ut, latitude, longitude, height):
+    """Topocentric Sun and Moon geometry and Odeh parameters of observers at given instants.
+
+    Returns:
+        A dictionary of arrays with the `calculate` fields evaluated at the instants `ut`.
+    """
+    sidereal = ephemeris.sidereal_degrees(ut)
+    observer = observer_vector(latitude, longitude, height, sidereal)
+    sun_geo = ephemeris.sun_vector(ut)
+    moon_geo = ephemeris.moon_vector(ut)
+    sun_topo = sun_geo - observer
+    moon_topo = moon_geo - observer
+    sun_alt, sun_az = horizon(sun_topo, latitude, longitude, sidereal)
+    moon_alt, moon_az = horizon(moon_topo, latitude, longitude, sidereal)
+
+    dist_km = KM_PER_AU * numpy.linalg.norm(moon_geo, axis=-1)
+    SD = numpy.degrees(numpy.arctan(MOON_MEAN_RADIUS_KM / numpy.sqrt(dist_km * dist_km - MOON_MEAN_RADIUS_KM * MOON_MEAN_RADIUS_KM))) * 60
+    lunar_parallax = SD / 0.27245
+    SD_topo = SD * (1 + numpy.sin(numpy.radians(moon_alt)) * numpy.sin(numpy.radians(lunar_parallax / 60)))
+
+    ARCL = angle_between(sun_topo, moon_topo)
+    DAZ = sun_az - moon_az
+    COSARCV = numpy.cos(numpy.radians(ARCL)) / numpy.cos(numpy.radians(DAZ))
+    ARCV = numpy.degrees(numpy.arccos(numpy.clip(COSARCV, -1.0, 1.0)))
+    W_topo = SD_topo * (1 - numpy.cos(numpy.radians(ARCL)))
+    V = ARCV - (7.1651 - 6.3226 * W_topo + 0.7319 * W_topo ** 2 - 0.1018 * W_topo ** 3)
+
+    return {
+        "sun_alt": sun_alt, "sun_az": sun_az,
+        "moon_elong_geo": angle_between(sun_geo, moon_geo), "moon_elong_topo": ARCL,
+        "moon_alt": moon_alt, "moon_az": moon_az, "lunar_parallax": lunar_parallax,
+        "SD": SD, "SD_topo": SD_topo, "COSARCV": COSARCV, "ARCV": ARCV,
+        "DALT": moon_alt - sun_alt, "DAZ": DAZ, "ARCL": ARCL, "W_topo": W_topo, "V": V,
+    }
+
+
+def calculate_batch(times, latitudes, longitudes, heights=0.0, refraction=1.0):
+    """Vectorized `odeh.calculate` over arrays of base times and observers.
+
+    The inputs are broadcast against each other. Observers sharing the same base time
+    share one set of Sun and Moon ephemeris samples.
+
+    Args:
+        times: Base times, as an `astronomy.TimeArray`, `astronomy.Time` objects or UT days since J2000.
+        latitudes: Observer latitudes in degrees.
+        longitudes: Observer longitudes in degrees (east positive).
+        heights: Observer elevations above sea level in meters.
+        refraction: Scale factor of the refraction at the horizon used for sunset and
+            moonset, 1 for the standard atmosphere of `calculate`.
+
+    Returns:
+        A VisibilityResultArray with one row per broadcast element, in C order.
+    """
+    ut, latitude, longitude, height, refraction = (
+        numpy.ravel(array).astype(float)
+        for array in numpy.broadcast_arrays(universal_times(times), latitudes, longitudes, heights, refraction)
+    )
+    size = len(ut)
+
+    columns = {name: numpy.full(size, numpy.nan) for name in (
+        "sunset", "moonset", "lag_time", "best_time", "sun_alt", "sun_az", "moon_elong_geo",
+        "moon_elong_topo", "moon_alt", "moon_az", "lunar_parallax", "SD", "SD_topo", "COSARCV",
+        "ARCV", "DALT", "DAZ", "ARCL", "W_topo", "V"
+    )}
+    status = numpy.full(size, STATUS_CODES.index(STATUS_NO_SET), dtype=numpy.int8)
+    q_code = numpy.full(size, "", dtype="<U1")
+
+    # Refraction near the horizon depends on the atmospheric density at the observer
+    densities = {h: astronomy.Atmosphere(h).density for h in numpy.unique(height)}
+    target_altitude = -_REFRACTION_NEAR_HORIZON * refraction * numpy.array([densities[h] for h in height])
+
+    instants, group_of = numpy.unique(ut, return_inverse=True)
+    for group, instant in enumerate(instants):
+        group_members = numpy.flatnonzero(group_of == group)
+        # This corrects the base time based on timezone, as in calculate
+        group_start = instant - longitude[group_members] / 360
+        ephemeris = Ephemeris(group_start.min(), group_start.max() + 1.0)
+        # Fixed-size blocks of observers bound the memory used whatever the number of observers
+        for block in range(0, len(group_members), BLOCK_SIZE):
+            members = group_members[block:block + BLOCK_SIZE]
+            start = group_start[block:block + BLOCK_SIZE]
+            observers = (latitude[members], longitude[members], height[members], target_altitude[members])
+
+            sunset = _search_set(_SetFunction(ephemeris, ephemeris.sun_vector, _SUN_RADIUS_AU, *observers), start)
+            moonset = _search_set(_SetFunction(ephemeris, ephemeris.moon_vector, _MOON_EQUATORIAL_RADIUS_AU, *observers), start)
+
+            lag_time = moonset - sunset
+            sets = numpy.isfinite(lag_time)
+            columns["sunset"][members[sets]] = sunset[sets]
+            columns["moonset"][members[sets]] = moonset[sets]
+            columns["lag_time"][members[sets]] = lag_time[sets]
+            late = sets & (lag_time < 0)
+            status[members[late]] = STATUS_CODES.index(STATUS_MOON_SETS_FIRST)
+            q_code[members[late]] = "E"
+
+            ok = sets & (lag_time >= 0)
+            if not ok.any():
+                continue
+            rows = members[ok]
+            lat, lon, h = latitude[rows], longitude[rows], height[rows]
+            best_time = sunset[ok] + lag_time[ok] * 4 / 9
+
+            values = {"best_time": best_time, **geometry(ephemeris, best_time, lat, lon, h)}
+            for name, value in values.items():
+                columns[name][rows] = value
+            status[rows] = STATUS_CODES.index(STATUS_OK)
+            V = values["V"]
+            q_code[rows] = numpy.select([V >= 5.65, V >= 2, V >= -0.96], ["A", "B", "C"], "D")
+
+    return VisibilityResultArray.from_columns(status, q_code, lat=latitude, long=longitude, **columns)
+
+
+class ObservationWindow(NamedTuple):
+    """Visibility parameters of an observer sampled from sunset to moonset.
+
+    Times are UT days since J2000, as `astronomy.Time.ut`. The peak is the highest V
+    among the samples where the Moon is above the horizon and the Sun within
+    PEAK_SUN_ALTITUDES, NaN when no sample qualifies.
+    """
+    sunset: float
+    moonset: float
+    times: numpy.ndarray
+    sun_alt: numpy.ndarray
+    moon_alt: numpy.ndarray
+    ARCV: numpy.ndarray
+    W_topo: numpy.ndarray
+    V: numpy.ndarray
+    q_code: numpy.ndarray
+    peak_time: float
+    peak_V: float
+
+
+def observation_window(base_time, latitude, longitude, height=0.0, step_minutes=2.0) -> Optional[ObservationWindow]:
+    """Sample the visibility parameters of an evening every few minutes, from sunset to moonset.
+
+    Sunset and moonset are found as in `calculate`, then every sample instant is evaluated
+    at once from one set of ephemeris samples.
+
+    Args:
+        base_time: The date of the evening, as given to `calculate`.
+        latitude: Observer latitude in degrees.
+        longitude: Observer longitude in degrees (east positive).
+        height: Observer elevation above sea level in meters.
+        step_minutes: Time between two samples, in minutes.
+
+    Returns:
+        The ObservationWindow, with the time of the highest V where the crescent can be
+        sighted (see ObservationWindow), refined between the samples, or None if the Sun or the Moon does not set, or the Moon sets first.
+    """
+    ut = base_time.ut if isinstance(base_time, astronomy.Time) else float(base_time)
+    start = numpy.array([ut - longitude / 360])
+    ephemeris = Ephemeris(start[0], start[0] + 1.0)
+    target_altitude = -_REFRACTION_NEAR_HORIZON * astronomy.Atmosphere(height).density
+    observers = (numpy.array([latitude]), numpy.array([longitude]), numpy.array([height]), numpy.array([target_altitude]))
+    sunset = _search_set(_SetFunction(ephemeris, ephemeris.sun_vector, _SUN_RADIUS_AU, *observers), start)[0]
+    moonset = _search_set(_SetFunction(ephemeris, ephemeris.moon_vector, _MOON_EQUATORIAL_RADIUS_AU, *observers), start)[0]
+    if not moonset >= sunset:
+        return None
+
+    times = numpy.append(numpy.arange(sunset, moonset, step_minutes / 1440), moonset)
+    values = geometry(ephemeris, times, latitude, longitude, height)
+    V = values["V"]
+
+    # V keeps growing as the Sun sinks, up to moonset: only consider the samples where the
+    # Moon is above the horizon and the sky dark enough, which excludes sunset and moonset
+    low, high = PEAK_SUN_ALTITUDES
+    candidates = (values["moon_alt"] > 0) & (values["sun_alt"] >= low) & (values["sun_alt"] <= high)
+    candidates[[0, -1]] = False
+    peak_time = peak_V = numpy.nan
+    if candidates.any():
+        peak = int(numpy.argmax(numpy.where(candidates, V, -numpy.inf)))
+        peak_time, peak_V = times[peak], V[peak]
+        if candidates[peak - 1] and candidates[peak + 1]:
+            # Vertex of the parabola through the highest sample and its neighbours
+            left, right = V[peak - 1] - V[peak], V[peak + 1] - V[peak]
+            curvature = left + right
+            if curvature < 0:
+                shift = 0.5 * (left - right) / curvature
+                peak_time = times[peak] + shift * (times[peak + 1] - times[peak])
+                peak_V = V[peak] - 0.25 * (left - right) * shift
+
+    return ObservationWindow(
+        sunset=float(sunset),
+        moonset=float(moonset),
+        times=times,
+        sun_alt=values["sun_alt"],
+        moon_alt=values["moon_alt"],
+        ARCV=values["ARCV"],
+        W_topo=values["W_topo"],
+        V=V,
+        q_code=numpy.select([V >= 5.65, V >= 2, V >= -0.96], ["A", "B", "C"], "D"),
+        peak_time=float(peak_time),
+        peak_V=float(peak_V),
+    )
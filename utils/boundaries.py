@@ -0,0 +1,107 @@
+"""Visibility zone boundaries traced directly as iso-lines.
+
+For each longitude, the latitudes where V crosses an Odeh zone threshold are bracketed
+on a coarse latitude scan, then refined with the bracketed root finder of the batch
+module. All longitudes are refined together, one `calculate_batch` call per iteration.
+The roots of neighbouring longitudes are finally chained into polylines.
+"""
+from typing import Dict, List, Sequence, Tuple
+
+import numpy
+import utils.astronomy_ as astronomy
+from utils.batch import calculate_batch, refine_roots
+from utils.maps import WORLD
+
+# Boundary name -> (calculate column, level): the Odeh zone thresholds of V, and the
+# boundary of the zone where the Moon sets before the Sun
+ZONE_BOUNDARIES: Dict[str, Tuple[str, float]] = {
+    "A/B": ("V", 5.65),
+    "B/C": ("V", 2.0),
+    "C/D": ("V", -0.96),
+    "D/E": ("lag_time", 0.0),
+}
+LATITUDE_TOLERANCE = 1e-4   # degrees, about 11 meters
+
+
+def _chain(longitudes: numpy.ndarray, roots: List[numpy.ndarray], max_jump: float) -> List[numpy.ndarray]:
+    """Link the roots found at consecutive longitudes into polylines of (longitude, latitude)."""
+    polylines: List[List[Tuple[float, float]]] = []
+    open_lines: Dict[float, int] = {}   # last latitude of a line ending at the previous longitude -> line
+    for longitude, latitudes in zip(longitudes, roots):
+        still_open: Dict[float, int] = {}
+        candidates = sorted(open_lines)
+        for latitude in latitudes:
+            nearest = min(candidates, key=lambda previous: abs(previous - latitude), default=None)
+            if nearest is not None and abs(nearest - latitude) <= max_jump:
+                candidates.remove(nearest)
+                line = open_lines[nearest]
+            else:
+                line = len(polylines)
+                polylines.append([])
+            polylines[line].append((longitude, latitude))
+            still_open[latitude] = line
+        open_lines = still_open
+    return [numpy.array(line) for line in polylines]
+
+
+def trace_boundaries(
+    base_time: astronomy.Time,
+    resolution: float = 1.0,
+    bbox: Sequence[float] = WORLD,
+    scan_step: float = 1.0,
+    tolerance: float = LATITUDE_TOLERANCE,
+    boundaries: Dict[str, Tuple[str, float]] = ZONE_BOUNDARIES
+) -> Dict[str, List[numpy.ndarray]]:
+    """Trace the boundaries between the visibility zones of an evening.
+
+    Args:
+        base_time: The date of the evening, as given to `calculate`.
+        resolution: Spacing of the longitudes where the boundaries are solved, in degrees.
+        bbox: Bounding box as (south latitude, north latitude, west longitude, east longitude).
+        scan_step: Latitude step of the scan bracketing the crossings, in degrees.
+            Two crossings of the same level closer than this may be missed.
+        tolerance: Precision of the boundary latitudes, in degrees.
+        boundaries: The boundaries to trace, as name -> (calculate column, level).
+
+    Returns:
+        A dictionary with the polylines of each boundary, as arrays of (longitude, latitude) rows.
+    """
+    south, north, west, east = bbox
+    longitudes = west + resolution * (numpy.arange(int(round((east - west) / resolution))) + 0.5)
+    latitudes = numpy.linspace(south, north, int(round((north - south) / scan_step)) + 1)
+    scan = calculate_batch(base_time, latitudes[None, :], longitudes[:, None])
+
+    # Brackets between two defined samples of opposite signs, for every boundary
+    offsets, names, rows, columns = [], [], [], []
+    for name, (column, level) in boundaries.items():
+        values = scan.column(column).reshape(len(longitudes), len(latitudes)) - level
+        crossing = numpy.isfinite(values[:, :-1]) & numpy.isfinite(values[:, 1:]) & \
+            (numpy.sign(values[:, :-1]) != numpy.sign(values[:, 1:]))
+        row, index = numpy.nonzero(crossing)
+        offsets.append(numpy.column_stack([values[row, index], values[row, index + 1]]))
+        names += [name] * len(row)
+        rows.append(row)
+        columns.append(index)
+    offsets, names = numpy.concatenate(offsets), numpy.array(names, dtype=object)
+    rows, columns = numpy.concatenate(rows), numpy.concatenate(columns)
+
+    def function(latitude, index):
+        # All the boundaries at all the longitudes are refined together
+        current = calculate_batch(base_time, latitude, longitudes[rows[index]])
+        return numpy.select(
+            [names[index] == name for name in boundaries],
+            [current.column(column) - level for column, level in boundaries.values()]
+        )
+
+    found = numpy.array([])
+    if len(rows):
+        found = refine_roots(function, latitudes[columns], latitudes[columns + 1],
+                             offsets[:, 0], offsets[:, 1], tolerance)
+
+    result = {}
+    for name in boundaries:
+        mine = names == name
+        found_here = mine & numpy.isfinite(found)
+        roots = [numpy.sort(found[found_here & (rows == index)]) for index in range(len(longitudes))]
+        result[name] = _chain(longitudes, roots, max_jump=2 * scan_step + resolution)
+    return result
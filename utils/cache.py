@@ -0,0 +1,153 @@
+import hashlib
+import json
+import threading
+import time as _time
+from datetime import datetime
+from pathlib import Path
+from typing import Union
+
+from utils.odeh import DICT_KEYS, TIME_FIELDS, VisibilityResult, calculate
+
+ENGINE_FILES = (
+    Path(__file__).resolve().parent / "astronomy_.py",
+    Path(__file__).resolve().parent / "odeh.py",
+)
+# Format of the stored values, part of the cache version so that older files are dropped
+VALUE_FORMAT = "json"
+# Keys of the datetimes in the results of `calculate`, stored as ISO strings
+TIME_KEYS = tuple(key for key, field in zip(DICT_KEYS, VisibilityResult._fields[1:]) if field in TIME_FIELDS)
+
+
+def engine_version(files=ENGINE_FILES):
+    """Fingerprint of the astronomy engine and the visibility criterion sources.
+
+    Any change in these files changes the version, which invalidates every cached result.
+
+    Args:
+        files: Source files the cached results depend on, ENGINE_FILES by default.
+    """
+    digest = hashlib.sha256()
+    for path in files:
+        digest.update(path.read_bytes())
+    return digest.hexdigest()[:16]
+
+
+def _encode(result):
+    """Serialize a result of `calculate` as JSON, with its datetimes as ISO strings."""
+    return json.dumps({key: value.isoformat() if key in TIME_KEYS else value for key, value in result.items()})
+
+
+def _decode(value):
+    """Deserialize a result stored by `_encode`."""
+    result = json.loads(value)
+    for key in TIME_KEYS:
+        if key in result:
+            result[key] = datetime.fromisoformat(result[key])
+    return result
+
+
+class CalculationCache:
+    """Persistent SQLite cache of `calculate` results with LRU eviction.
+
+    Results are keyed by (UTC time, latitude, longitude, height, engine version). Entries
+    computed by another version of the engine are dropped when the cache is opened.
+    The results are stored as JSON rather than pickled, so that reading a shared cache
+    file never executes code. The cache is safe to share between threads.
+
+    Example:
+        cache = CalculationCache("odeh_cache.sqlite")
+        parameters = cache.calculate(astronomy.Time.Make(2025, 3, 29, 0, 0, 0), 34.0084, -6.8539)
+    """
+
+    def __init__(self, path: Union[str, Path] = ":memory:", max_entries: int = 100_000):
+        """Open (or create) the cache database.
+
+        Args:
+            path: Path of the SQLite file. Defaults to a non-persistent in-memory database.
+            max_entries: Maximum number of results kept, the least recently used are evicted.
+        """
+        import sqlite3
+
+        self.path = str(path)
+        self.max_entries = max_entries
+        self.version = f"{engine_version()}-{VALUE_FORMAT}"
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(self.path, check_same_thread=False)
+        self._count = 0
+        with self._lock, self._connection:
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                "ut REAL, latitude REAL, longitude REAL, height REAL, version TEXT, "
+                "value TEXT, last_access REAL, "
+                "PRIMARY KEY (ut, latitude, longitude, height, version))"
+            )
+            self._connection.execute(
+                "CREATE INDEX IF NOT EXISTS results_last_access ON results (last_access)"
+            )
+            self._connection.execute("DELETE FROM results WHERE version != ?", (self.version,))
+            self._count = self._connection.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+    def calculate(self, base_time, latitude, longitude, height=0.0):
+        """Same as `calculate`, reading the result from the cache when available."""
+        result = self.get(base_time, latitude, longitude, height)
+        if result is None:
+            result = calculate(base_time, latitude, longitude, height)
+            self.put(base_time, latitude, longitude, result, height)
+        return result
+
+    def get(self, base_time, latitude, longitude, height=0.0):
+        """Return the cached result of `calculate`, or None if it is not cached."""
+        key = (base_time.ut, float(latitude), float(longitude), float(height), self.version)
+        with self._lock, self._connection:
+            row = self._connection.execute(
+                "SELECT value FROM results WHERE ut = ? AND latitude = ? AND longitude = ? "
+                "AND height = ? AND version = ?", key
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._connection.execute(
+                "UPDATE results SET last_access = ? WHERE ut = ? AND latitude = ? "
+                "AND longitude = ? AND height = ? AND version = ?", (_time.time(),) + key
+            )
+            return _decode(row[0])
+
+    def put(self, base_time, latitude, longitude, result, height=0.0):
+        """Store a result of `calculate` computed elsewhere, e.g. in a worker process."""
+        key = (base_time.ut, float(latitude), float(longitude), float(height), self.version)
+        with self._lock, self._connection:
+            self._count += 1
+            self._connection.execute(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?, ?)",
+                key + (_encode(result), _time.time())
+            )
+            self._evict()
+
+    def _evict(self):
+        """Delete the least recently used results above `max_entries`."""
+        if self._count <= self.max_entries:
+            return
+        # Other processes may share the file, so recount before evicting
+        self._count = self._connection.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+        if self._count > self.max_entries:
+            self._connection.execute(
+                "DELETE FROM results WHERE rowid IN "
+                "(SELECT rowid FROM results ORDER BY last_access LIMIT ?)", (self._count - self.max_entries,)
+            )
+            self._count = self.max_entries
+
+    def __len__(self):
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+    def clear(self):
+        """Delete every cached result."""
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM results")
+            self._count = 0
+
+    def close(self):
+        self._connection.close()
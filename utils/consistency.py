@@ -0,0 +1,170 @@
+"""Consistency checks between the vectorized or fast code paths and their reference versions.
+
+Several computations exist twice: a reference version following the original code and
+a faster copy (vectorized over arrays of times, or skipping unused fields). These checks
+compare both over a spread of epochs, so that the copies cannot silently drift apart
+when one of them is changed. They exit with a non-zero status if a tolerance is exceeded.
+
+Usage:
+    python -m utils.consistency
+"""
+import argparse
+import sys
+from datetime import date, timedelta
+from typing import Callable, Dict, Tuple
+
+import numpy
+import utils.astronomy_ as astronomy
+from utils.odeh import calculate, calculate_features
+
+# Check name -> tolerance, in the unit of the measured deviation
+TOLERANCES = {
+    "moon": 1e-15,      # AU
+    "sun": 1e-10,       # AU
+    "features": 1e-9,   # degrees (ARCV), arcminutes (W_topo) and V units
+    "checker": 1e-12,   # probability
+    "time": 1e-12,      # days (TT, UT), sidereal hours and rotation matrix elements
+}
+# Sites of the checks: (latitude, longitude)
+SITES = ((34.0084, -6.8539), (21.4225, 39.8262), (-33.9249, 18.4241), (51.4779, -0.0015))
+
+
+def _epochs(count: int, seed: int = 0) -> astronomy.TimeArray:
+    """Random UT days between the years 1600 and 2400, with fixed dates around J2000."""
+    rng = numpy.random.default_rng(seed)
+    start = astronomy.Time.Make(1600, 1, 1, 0, 0, 0).ut
+    stop = astronomy.Time.Make(2400, 1, 1, 0, 0, 0).ut
+    fixed = [-36525.0, -0.5, 0.0, 0.5, 9000.25, 36525.0]
+    return astronomy.TimeArray(numpy.concatenate([fixed, rng.uniform(start, stop, count)]))
+
+
+def check_moon(count: int) -> float:
+    """Maximum distance in AU between `GeoMoonBatch` and `GeoMoon`."""
+    times = _epochs(count)
+    batch = astronomy.GeoMoonBatch(times)
+    deviation = 0.0
+    for k in range(len(times)):
+        vec = astronomy.GeoMoon(times[k])
+        deviation = max(deviation, float(numpy.linalg.norm(batch[k] - (vec.x, vec.y, vec.z))))
+    return deviation
+
+
+def check_sun(count: int) -> float:
+    """Maximum distance in AU between `GeoSunBatch` and `GeoVector(Body.Sun, ...)`, with and without aberration."""
+    times = _epochs(count)
+    deviation = 0.0
+    for aberration in (True, False):
+        batch = astronomy.GeoSunBatch(times, aberration)
+        for k in range(len(times)):
+            vec = astronomy.GeoVector(astronomy.Body.Sun, times[k], aberration)
+            deviation = max(deviation, float(numpy.linalg.norm(batch[k] - (vec.x, vec.y, vec.z))))
+    return deviation
+
+
+def check_time(count: int) -> float:
+    """Maximum difference between the `TimeArray` functions and their scalar versions.
+
+    Covers the TT of a `TimeArray`, the UT of `TimeArray.FromTerrestrialTime`,
+    `SiderealTimeArray`, `_nutation_rot_array` and `_precession_rot_array`.
+    """
+    times = _epochs(count)
+    from_tt = astronomy.TimeArray.FromTerrestrialTime(times.tt)
+    sidereal = astronomy.SiderealTimeArray(times)
+    nutation = {direction: astronomy._nutation_rot_array(times, direction) for direction in astronomy._PrecessDir}
+    precession = {direction: astronomy._precession_rot_array(times.tt, direction) for direction in astronomy._PrecessDir}
+    deviation = 0.0
+    for k in range(len(times)):
+        time = astronomy.Time(float(times.ut[k]))
+        deviation = max(
+            deviation,
+            abs(times.tt[k] - time.tt),
+            abs(from_tt.ut[k] - astronomy.Time.FromTerrestrialTime(time.tt).ut),
+            abs(sidereal[k] - astronomy.SiderealTime(time))
+        )
+        for direction in astronomy._PrecessDir:
+            for batch, scalar in ((nutation, astronomy._nutation_rot), (precession, astronomy._precession_rot)):
+                deviation = max(deviation, float(numpy.abs(batch[direction][k] - scalar(time, direction).rot).max()))
+    return deviation
+
+
+def check_features(count: int) -> float:
+    """Maximum difference between the values of `calculate_features` and `calculate`.
+
+    The Odeh code must be identical; an infinite deviation is returned otherwise.
+    """
+    times = _epochs(count)
+    deviation = 0.0
+    for k in range(len(times)):
+        # Midnight UT of the day, as the base times of the checker
+        base_time = astronomy.Time(numpy.floor(times.ut[k] - 0.5) + 0.5)
+        for latitude, longitude in SITES:
+            expected = calculate(base_time, latitude, longitude)
+            actual = calculate_features(base_time, latitude, longitude)
+            if actual.get("q_code") != expected.get("q_code"):
+                return float("inf")
+            for key in ("ARCV", "W_topo", "V"):
+                if key in actual:
+                    deviation = max(deviation, abs(actual[key] - expected[key]))
+    return deviation
+
+
+def check_checker(count: int) -> float:
+    """Maximum difference between the probabilities given for Rabat by the checker methods.
+
+    `evaluate_sites`, the "moroccan_ml" entry of `evaluate_criteria` and the nominal
+    probability of `get_visibility_uncertainty` must give Rabat the probability of the
+    single-site predictions of `get_miladi_day_for_hilal`.
+    """
+    from moroccan_hilal_checker.moroccan_hilal_checker import MOROCCAN_SITES, MoroccanHilalChecker
+
+    checker = MoroccanHilalChecker()
+    times = _epochs(count)
+    deviation = 0.0
+    try:
+        for k in range(len(times)):
+            utc = times[k].Utc()
+            # The evening after the new moon, where the probabilities are not all zero
+            evening = checker._conjunction_date(date(utc.year, utc.month, utc.day)) + timedelta(days=1)
+            expected = checker._predict_evening(evening, checker.scorer).probability
+            probabilities, _ = checker.evaluate_sites(evening, {"Rabat": MOROCCAN_SITES["Rabat"]})
+            deviation = max(deviation, abs(probabilities["Rabat"] - expected))
+            criterion = checker.evaluate_criteria(evening)["moroccan_ml"]
+            deviation = max(deviation, abs(criterion.value - expected))
+            uncertainty = checker.get_visibility_uncertainty(evening, samples=10, seed=0)
+            deviation = max(deviation, abs(uncertainty.probability - expected))
+    finally:
+        checker.close()
+    return deviation
+
+
+CHECKS: Dict[str, Tuple[Callable[[int], float], int]] = {
+    # Name -> (check, default number of random epochs)
+    "moon": (check_moon, 2000),
+    "sun": (check_sun, 500),
+    "time": (check_time, 2000),
+    "features": (check_features, 100),
+    "checker": (check_checker, 50),
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the fast code paths with their reference versions.")
+    parser.add_argument("checks", nargs="*", help=f"Checks to run, among {', '.join(CHECKS)} (default: all)")
+    parser.add_argument("--count", type=int, help="Number of random epochs of each check")
+    args = parser.parse_args()
+    unknown = set(args.checks) - set(CHECKS)
+    if unknown:
+        parser.error(f"Unknown checks: {', '.join(sorted(unknown))}")
+
+    failed = False
+    for name in args.checks or CHECKS:
+        check, count = CHECKS[name]
+        deviation = check(args.count or count)
+        ok = deviation <= TOLERANCES[name]
+        failed |= not ok
+        print(f"{name:10s} max deviation {deviation:.3e} (tolerance {TOLERANCES[name]:.0e}) {'ok' if ok else 'FAILED'}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+"""Several crescent visibility criteria computed from one set of shared intermediates.
+
+Sunset, moonset and the Sun and Moon geometry are computed once per observer, by
+`calculate_result` (or `calculate_batch` for arrays of observers), plus the Moon's
+topocentric geometry at sunset for the rules defined at that instant. Every registered
+criterion is then a cheap NumPy expression over these intermediates.
+
+Example:
+    results = evaluate_criteria(astronomy.Time.Make(2025, 3, 29, 0, 0, 0), 34.0084, -6.8539)
+    V, odeh_code = results["odeh"]
+    q, yallop_code = results["yallop"]
+"""
+from typing import Callable, Dict, NamedTuple, Optional, Sequence, Tuple
+
+import numpy
+import utils.astronomy_ as astronomy
+from utils.odeh import STATUS_MOON_SETS_FIRST, STATUS_NO_SET, STATUS_OK, FLOAT_FIELDS, calculate_result
+
+VISIBLE = "visible"
+NOT_VISIBLE = "not_visible"
+# Intermediates at sunset, in addition to the VisibilityResult fields at best time
+SUNSET_FIELDS = ("sunset_sun_alt", "sunset_moon_alt", "sunset_sun_az", "sunset_moon_az", "sunset_elongation")
+
+
+class CriterionResult(NamedTuple):
+    """The value of a criterion (e.g. Odeh V, Yallop q) and its visibility code."""
+    value: numpy.ndarray
+    code: numpy.ndarray
+
+
+Criterion = Callable[[Dict[str, numpy.ndarray]], CriterionResult]
+CRITERIA: Dict[str, Criterion] = {}
+
+
+def register_criterion(name: str, criterion: Criterion) -> Criterion:
+    """Add a criterion to those computed by default.
+
+    Args:
+        name: Name of the criterion in the results.
+        criterion: A function of the intermediates (arrays of the VisibilityResult fields,
+                   `status`, `q_code` and the SUNSET_FIELDS) returning a CriterionResult.
+    """
+    CRITERIA[name] = criterion
+    return criterion
+
+
+def odeh(intermediates):
+    return CriterionResult(intermediates["V"], intermediates["q_code"])
+
+
+def yallop(intermediates):
+    # Yallop (1997), NAO Technical Note 69
+    W = intermediates["W_topo"]
+    q = (intermediates["ARCV"] - (11.8371 - 6.3226 * W + 0.7319 * W ** 2 - 0.1018 * W ** 3)) / 10
+    code = numpy.select(
+        [q > 0.216, q > -0.014, q > -0.160, q > -0.232, q > -0.293],
+        ["A", "B", "C", "D", "E"], "F"
+    )
+    status = intermediates["status"]
+    code = numpy.where(status == STATUS_OK, code, numpy.where(status == STATUS_MOON_SETS_FIRST, "F", ""))
+    return CriterionResult(q, code)
+
+
+class AltitudeElongationRule:
+    """A criterion made of minimum Moon altitude and elongation at sunset, and lag time.
+
+    The value is the topocentric (airless) altitude of the Moon at sunset, in degrees.
+    """
+
+    def __init__(
+        self,
+        min_altitude: Optional[float] = None,
+        min_elongation: Optional[float] = None,
+        min_lag_minutes: Optional[float] = None
+    ):
+        self.min_altitude = min_altitude
+        self.min_elongation = min_elongation
+        self.min_lag_minutes = min_lag_minutes
+
+    def __call__(self, intermediates):
+        status = intermediates["status"]
+        visible = status == STATUS_OK
+        with numpy.errstate(invalid="ignore"):
+            if self.min_altitude is not None:
+                visible &= intermediates["sunset_moon_alt"] >= self.min_altitude
+            if self.min_elongation is not None:
+                visible &= intermediates["sunset_elongation"] >= self.min_elongation
+            if self.min_lag_minutes is not None:
+                visible &= intermediates["lag_time"] * 1440 >= self.min_lag_minutes
+        code = numpy.where(visible, VISIBLE, numpy.where(status == STATUS_NO_SET, "", NOT_VISIBLE))
+        return CriterionResult(intermediates["sunset_moon_alt"], code)
+
+
+class AltitudeAzimuthRule:
+    """A criterion made of curves of the Moon-Sun altitude difference against their azimuth
+    difference at sunset, such as the SAAO criterion (Caldwell & Laney, 2001).
+
+    The value is the altitude difference DALT at sunset, in degrees. Each boundary is a
+    (code, coefficients) pair, the coefficients of the minimum DALT as a polynomial of
+    |DAZ| in degrees (highest power first, as `numpy.polyval`). Boundaries are given from
+    the lowest to the highest: the code is that of the highest boundary below DALT, or
+    NOT_VISIBLE below all of them.
+    """
+
+    def __init__(self, boundaries: Sequence[Tuple[str, Sequence[float]]]):
+        self.boundaries = boundaries
+
+    def __call__(self, intermediates):
+        status = intermediates["status"]
+        dalt = intermediates["sunset_moon_alt"] - intermediates["sunset_sun_alt"]
+        daz = numpy.abs((intermediates["sunset_sun_az"] - intermediates["sunset_moon_az"] + 180.0) % 360.0 - 180.0)
+        code = numpy.full(len(status), NOT_VISIBLE, dtype=object)
+        with numpy.errstate(invalid="ignore"):
+            for name, coefficients in self.boundaries:
+                code[dalt >= numpy.polyval(coefficients, daz)] = name
+        code[status != STATUS_OK] = NOT_VISIBLE
+        code[status == STATUS_NO_SET] = ""
+        return CriterionResult(dalt, code.astype(str))
+
+
+class ScorerCriterion:
+    """A criterion made of a model scoring (ARCV, W_topo), such as the Moroccan model.
+
+    The value is the probability of visibility given by `scorer.predict_proba(arcv, w_topo)`.
+    """
+
+    def __init__(self, scorer, threshold: float = 0.5):
+        self.scorer = scorer
+        self.threshold = threshold
+
+    def __call__(self, intermediates):
+        status = intermediates["status"]
+        ok = status == STATUS_OK
+        probability = numpy.full(len(status), numpy.nan)
+        if ok.any():
+            probability[ok] = self.scorer.predict_proba(intermediates["ARCV"][ok], intermediates["W_topo"][ok])
+        with numpy.errstate(invalid="ignore"):
+            visible = ok & (probability > self.threshold)
+        code = numpy.where(visible, VISIBLE, numpy.where(status == STATUS_NO_SET, "", NOT_VISIBLE))
+        return CriterionResult(probability, code)
+
+
+register_criterion("odeh", odeh)
+register_criterion("yallop", yallop)
+# Istanbul 1978 conference: altitude >= 5 deg and elongation >= 8 deg at sunset
+register_criterion("istanbul", AltitudeElongationRule(min_altitude=5.0, min_elongation=8.0))
+# MABIMS 2021: altitude >= 3 deg and elongation >= 6.4 deg at sunset
+register_criterion("mabims", AltitudeElongationRule(min_altitude=3.0, min_elongation=6.4))
+
+
+def intermediates(base_time, latitude, longitude, height=0.0):
+    """Compute the intermediates shared by the criteria for one observer, as 1-element arrays."""
+    result = calculate_result(base_time, latitude, longitude, height)
+    values = {name: numpy.array([numpy.nan if value is None else value], dtype=float)
+              for name, value in zip(FLOAT_FIELDS, result[1:-2] + result[-1:])}
+    values["status"] = numpy.array([result.status])
+    values["q_code"] = numpy.array([result.q_code or ""])
+    values.update({name: numpy.full(1, numpy.nan) for name in SUNSET_FIELDS})
+    if result.status == STATUS_OK:
+        observer = astronomy.Observer(latitude, longitude, height)
+        sunset = astronomy.Time(result.sunset)
+        sun = astronomy.Equator(astronomy.Body.Sun, sunset, observer, True, True)
+        moon = astronomy.Equator(astronomy.Body.Moon, sunset, observer, True, True)
+        moon_horizon = astronomy.Horizon(sunset, observer, moon.ra, moon.dec, astronomy.Refraction.Airless)
+        sun_horizon = astronomy.Horizon(sunset, observer, sun.ra, sun.dec, astronomy.Refraction.Airless)
+        values["sunset_sun_alt"][0] = sun_horizon.altitude
+        values["sunset_moon_alt"][0] = moon_horizon.altitude
+        values["sunset_sun_az"][0] = sun_horizon.azimuth
+        values["sunset_moon_az"][0] = moon_horizon.azimuth
+        values["sunset_elongation"][0] = astronomy.AngleBetween(sun.vec, moon.vec)
+    return values
+
+
+def intermediates_batch(times, latitudes, longitudes, heights=0.0):
+    """Compute the intermediates shared by the criteria for arrays of observers (see `calculate_batch`)."""
+    from utils.batch import Ephemeris, calculate_batch, geometry, universal_times
+
+    results = calculate_batch(times, latitudes, longitudes, heights)
+    values = {name: results.column(name) for name in FLOAT_FIELDS + ("status", "q_code")}
+    values.update({name: numpy.full(len(results), numpy.nan) for name in SUNSET_FIELDS})
+
+    ok = numpy.flatnonzero(values["status"] == STATUS_OK)
+    if len(ok):
+        shape = numpy.broadcast(universal_times(times), latitudes, longitudes, heights).shape
+        height = numpy.broadcast_to(heights, shape).ravel()
+        sunset = values["sunset"][ok]
+        # One ephemeris covering the sunsets, which are close to each other for each evening
+        order = numpy.argsort(sunset)
+        groups = numpy.split(order, numpy.flatnonzero(numpy.diff(sunset[order]) > 1.0) + 1)
+        for group in groups:
+            rows = ok[group]
+            ephemeris = Ephemeris(sunset[group].min(), sunset[group].max())
+            at_sunset = geometry(ephemeris, sunset[group], values["lat"][rows], values["long"][rows], height[rows])
+            values["sunset_sun_alt"][rows] = at_sunset["sun_alt"]
+            values["sunset_moon_alt"][rows] = at_sunset["moon_alt"]
+            values["sunset_sun_az"][rows] = at_sunset["sun_az"]
+            values["sunset_moon_az"][rows] = at_sunset["moon_az"]
+            values["sunset_elongation"][rows] = at_sunset["ARCL"]
+    return values
+
+
+def apply_criteria(intermediates, criteria: Optional[Dict[str, Criterion]] = None) -> Dict[str, CriterionResult]:
+    """Evaluate criteria (by default every registered criterion) on shared intermediates."""
+    return {name: criterion(intermediates) for name, criterion in (criteria or CRITERIA).items()}
+
+
+def evaluate_criteria(base_time, latitude, longitude, height=0.0, criteria=None):
+    """Evaluate several criteria for one observer, computing the astronomy once.
+
+    Args:
+        base_time: The date of the evening, as given to `calculate`.
+        latitude: Observer latitude in degrees.
+        longitude: Observer longitude in degrees (east positive).
+        height: Observer elevation above sea level in meters.
+        criteria: Optional criteria by name. If not provided, uses every registered criterion.
+
+    Returns:
+        A dictionary mapping each criterion to its (value, code), NaN and "" when undefined.
+    """
+    results = apply_criteria(intermediates(base_time, latitude, longitude, height), criteria)
+    return {name: CriterionResult(float(value[0]), str(code[0])) for name, (value, code) in results.items()}
+
+
+def evaluate_criteria_batch(times, latitudes, longitudes, heights=0.0, criteria=None):
+    """Vectorized `evaluate_criteria` over arrays of observers, with one array per criterion field."""
+    return apply_criteria(intermediates_batch(times, latitudes, longitudes, heights), criteria)
@@ -0,0 +1,348 @@
+"""Parallel, file-backed global visibility maps.
+
+A map is a directory holding one memory-mapped `.npy` raster per quantity plus a
+`meta.json` description. Latitude bands are computed with `calculate_batch` in worker
+processes, which write their rows straight into the rasters; a band is marked done only
+once its rows are flushed, so an interrupted run resumes where it stopped.
+Rendering is a separate, optional step.
+
+`generate_adaptive_map` computes the same map as a quadtree, only resolving finely the
+cells near the boundaries between visibility zones.
+
+Usage:
+    python -m utils.maps 2022-06-29 maps/2022-06-29 --resolution 0.25
+"""
+import argparse
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Optional, Sequence
+
+import numpy
+import utils.astronomy_ as astronomy
+
+Q_CODES = "ABCDE"
+PENDING = 0                         # q_code raster value of cells not computed yet
+NO_SET = len(Q_CODES) + 1           # q_code raster value of cells where the Sun or Moon does not set
+# Color of each q_code, as in the crescent visibility distribution plot
+Q_CODE_COLORS = {
+    "A": "royalblue",
+    "B": "seagreen",
+    "C": "gold",
+    "D": "coral",
+    "E": "slategray",
+}
+WORLD = (-90.0, 90.0, -180.0, 180.0)
+RASTERS = ("V", "ARCV", "W_topo")
+
+
+class MapGrid:
+    """Cell centers of a regular latitude/longitude grid, rows running from north to south."""
+
+    def __init__(self, resolution: float = 1.0, bbox: Sequence[float] = WORLD):
+        """Initialize the MapGrid.
+
+        Args:
+            resolution: Cell size in degrees.
+            bbox: Bounding box as (south latitude, north latitude, west longitude, east longitude).
+        """
+        self.resolution = float(resolution)
+        self.bbox = tuple(float(value) for value in bbox)
+        south, north, west, east = self.bbox
+        rows = int(round((north - south) / self.resolution))
+        columns = int(round((east - west) / self.resolution))
+        self.latitudes = north - self.resolution * (numpy.arange(rows) + 0.5)
+        self.longitudes = west + self.resolution * (numpy.arange(columns) + 0.5)
+
+    @property
+    def shape(self):
+        return len(self.latitudes), len(self.longitudes)
+
+    def to_dict(self):
+        return {"resolution": self.resolution, "bbox": list(self.bbox)}
+
+
+def encode_q_codes(q_code):
+    """Convert an array of q_code strings ("" when not computed) to raster values."""
+    values = numpy.full(numpy.shape(q_code), NO_SET, dtype=numpy.uint8)
+    for index, code in enumerate(Q_CODES):
+        values[q_code == code] = index + 1
+    return values
+
+
+def _compute_band(path: str, ut: float, rows: Sequence[int]) -> Sequence[int]:
+    """Compute some rows of a map and write them to its rasters (runs in a worker process)."""
+    from utils.batch import calculate_batch
+
+    with open(os.path.join(path, "meta.json"), "r", encoding="utf-8") as file:
+        meta = json.load(file)
+    grid = MapGrid(meta["resolution"], meta["bbox"])
+    latitudes, longitudes = numpy.meshgrid(grid.latitudes[rows], grid.longitudes, indexing="ij")
+    result = calculate_batch(ut, latitudes, longitudes)
+
+    for name in RASTERS:
+        raster = numpy.load(os.path.join(path, f"{name}.npy"), mmap_mode="r+")
+        raster[rows] = result.column(name).reshape(latitudes.shape)
+        raster.flush()
+    q_code = numpy.load(os.path.join(path, "q_code.npy"), mmap_mode="r+")
+    q_code[rows] = encode_q_codes(result.q_code).reshape(latitudes.shape)
+    q_code.flush()
+    return rows
+
+
+def generate_map(
+    base_time: astronomy.Time,
+    path,
+    resolution: float = 1.0,
+    bbox: Sequence[float] = WORLD,
+    band_rows: int = 8,
+    max_workers: Optional[int] = None
+) -> Path:
+    """Compute the visibility map of an evening into a directory, resuming an earlier run.
+
+    Args:
+        base_time: The date of the evening, as given to `calculate`.
+        path: The map directory. It is created if needed.
+        resolution: Cell size in degrees.
+        bbox: Bounding box as (south latitude, north latitude, west longitude, east longitude).
+        band_rows: Number of grid rows computed by a worker at a time.
+        max_workers: Maximum number of worker processes. If not provided, uses the number of processors.
+
+    Returns:
+        The map directory.
+
+    Raises:
+        ValueError: If the directory holds a map of another evening or grid
+    """
+    path = Path(path)
+    grid = MapGrid(resolution, bbox)
+    meta = {"ut": base_time.ut, "utc": base_time.Utc().isoformat(), **grid.to_dict(), "band_rows": band_rows}
+    bands = [list(range(start, min(start + band_rows, grid.shape[0]))) for start in range(0, grid.shape[0], band_rows)]
+
+    meta_path = path / "meta.json"
+    if meta_path.exists():
+        with open(meta_path, "r", encoding="utf-8") as file:
+            existing = json.load(file)
+        if {key: existing.get(key) for key in meta} != meta:
+            raise ValueError(f"{path} holds another map: {existing}")
+    else:
+        path.mkdir(parents=True, exist_ok=True)
+        for name in RASTERS:
+            numpy.lib.format.open_memmap(path / f"{name}.npy", mode="w+", dtype=numpy.float32, shape=grid.shape)[:] = numpy.nan
+        numpy.lib.format.open_memmap(path / "q_code.npy", mode="w+", dtype=numpy.uint8, shape=grid.shape)[:] = PENDING
+        numpy.save(path / "bands_done.npy", numpy.zeros(len(bands), dtype=bool))
+        # Written last: a directory without meta.json is not a map yet
+        with open(meta_path, "w", encoding="utf-8") as file:
+            json.dump(meta, file, indent=2)
+
+    done = numpy.load(path / "bands_done.npy", mmap_mode="r+")
+    pending = [index for index in range(len(bands)) if not done[index]]
+    if pending:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = {executor.submit(_compute_band, str(path), base_time.ut, bands[index]): index for index in pending}
+            for future in futures:
+                future.result()
+                done[futures[future]] = True
+                done.flush()
+    return path
+
+
+def load_map(path):
+    """Load a map directory as a dictionary of arrays (memory-mapped) plus its metadata."""
+    path = Path(path)
+    with open(path / "meta.json", "r", encoding="utf-8") as file:
+        meta = json.load(file)
+    grid = MapGrid(meta["resolution"], meta["bbox"])
+    result = {name: numpy.load(path / f"{name}.npy", mmap_mode="r") for name in RASTERS + ("q_code",)}
+    result.update(meta=meta, latitudes=grid.latitudes, longitudes=grid.longitudes,
+                  complete=bool(numpy.load(path / "bands_done.npy").all()))
+    return result
+
+
+def render_map(path, output=None):
+    """Draw the q_code raster of a map, to a file if `output` is given, else on screen.
+
+    Args:
+        path: A map directory, or an `AdaptiveMap`.
+        output: Optional path of the image file to write.
+    """
+    if isinstance(path, AdaptiveMap):
+        q_code, bbox, title = path.to_raster(), path.bbox, path.utc
+    else:
+        data = load_map(path)
+        q_code, bbox, title = data["q_code"], data["meta"]["bbox"], data["meta"]["utc"]
+
+    import matplotlib
+    if output is not None:
+        matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    from matplotlib.colors import ListedColormap
+
+    south, north, west, east = bbox
+    colormap = ListedColormap(["white"] + [Q_CODE_COLORS[code] for code in Q_CODES] + ["lightgray"])
+    figure, axes = plt.subplots(figsize=(12, 6))
+    axes.imshow(q_code, cmap=colormap, vmin=PENDING - 0.5, vmax=NO_SET + 0.5,
+                extent=(west, east, south, north), interpolation="nearest")
+    axes.set_title(f"Crescent visibility (Odeh) - {title}")
+    axes.set_xlabel("Longitude")
+    axes.set_ylabel("Latitude")
+    if output is None:
+        plt.show()
+    else:
+        figure.savefig(output, dpi=150, bbox_inches="tight")
+        plt.close(figure)
+
+
+class AdaptiveMap:
+    """A visibility map stored as the leaves of a quadtree.
+
+    Each leaf is a rectangle of whole cells of the finest grid, given by its row and
+    column bounds `[row_start, row_stop) x [column_start, column_stop)` counted from the
+    south-west corner of the bounding box, and the raster value of its q_code.
+    """
+
+    def __init__(self, ut: float, utc: str, resolution: float, bbox: Sequence[float], leaves, evaluations: int):
+        self.ut = ut
+        self.utc = utc
+        self.grid = MapGrid(resolution, bbox)
+        self.resolution = self.grid.resolution
+        self.bbox = self.grid.bbox
+        self.leaves = numpy.asarray(leaves, dtype=numpy.int32).reshape(-1, 5)
+        # Number of observers evaluated to build the map
+        self.evaluations = evaluations
+
+    def __len__(self) -> int:
+        return len(self.leaves)
+
+    def boxes(self):
+        """Return the leaves as (south, north, west, east) in degrees, and their q_code raster values."""
+        south, _, west, _ = self.bbox
+        bounds = numpy.column_stack([
+            south + self.resolution * self.leaves[:, 0],
+            south + self.resolution * self.leaves[:, 1],
+            west + self.resolution * self.leaves[:, 2],
+            west + self.resolution * self.leaves[:, 3],
+        ])
+        return bounds, self.leaves[:, 4].astype(numpy.uint8)
+
+    def to_raster(self):
+        """Expand the leaves to the q_code raster of the finest grid, rows from north to south."""
+        rows = self.grid.shape[0]
+        raster = numpy.full(self.grid.shape, PENDING, dtype=numpy.uint8)
+        for row_start, row_stop, column_start, column_stop, code in self.leaves:
+            raster[rows - row_stop:rows - row_start, column_start:column_stop] = code
+        return raster
+
+    def save(self, path):
+        numpy.savez_compressed(path, leaves=self.leaves, meta=json.dumps({
+            "ut": self.ut, "utc": self.utc, **self.grid.to_dict(), "evaluations": self.evaluations,
+        }))
+
+    @classmethod
+    def load(cls, path) -> "AdaptiveMap":
+        with numpy.load(path) as data:
+            meta = json.loads(str(data["meta"]))
+            return cls(meta["ut"], meta["utc"], meta["resolution"], meta["bbox"], data["leaves"], meta["evaluations"])
+
+
+def generate_adaptive_map(
+    base_time: astronomy.Time,
+    resolution: float = 0.25,
+    levels: int = 5,
+    bbox: Sequence[float] = WORLD
+) -> AdaptiveMap:
+    """Compute the visibility map of an evening, refining only the cells near zone boundaries.
+
+    The bounding box is first divided in cells of `resolution * 2 ** levels` degrees whose
+    corners are evaluated. Cells whose four corners share the same q_code are kept whole;
+    the others are split in four, level after level. Cells of the finest grid that still
+    straddle a boundary take the q_code of their center, as in `generate_map`. Features
+    smaller than a cell whose corners agree (such as a zone boundary crossing one edge twice)
+    are not resolved.
+
+    Args:
+        base_time: The date of the evening, as given to `calculate`.
+        resolution: Cell size of the finest grid, in degrees.
+        levels: Number of subdivisions between the coarse grid and the finest grid.
+        bbox: Bounding box as (south latitude, north latitude, west longitude, east longitude).
+
+    Returns:
+        The quadtree leaves as an AdaptiveMap.
+    """
+    from utils.batch import calculate_batch
+
+    grid = MapGrid(resolution, bbox)
+    south, _, west, _ = grid.bbox
+    rows, columns = grid.shape
+    step = 2 ** levels
+    # Corner (row, column) of the finest grid -> q_code raster value
+    corners = {}
+    evaluations = 0
+
+    def evaluate(points, offset):
+        nonlocal evaluations
+        if not points:
+            return []
+        points = numpy.asarray(points, dtype=float)
+        result = calculate_batch(base_time, south + grid.resolution * (points[:, 0] + offset),
+                                 west + grid.resolution * (points[:, 1] + offset))
+        evaluations += len(points)
+        return encode_q_codes(result.q_code)
+
+    cells = [
+        (row, min(row + step, rows), column, min(column + step, columns))
+        for row in range(0, rows, step) for column in range(0, columns, step)
+    ]
+    leaves, straddling = [], []
+    while cells:
+        missing = sorted({
+            corner for row_start, row_stop, column_start, column_stop in cells
+            for corner in ((row_start, column_start), (row_start, column_stop),
+                           (row_stop, column_start), (row_stop, column_stop))
+            if corner not in corners
+        })
+        corners.update(zip(missing, evaluate(missing, 0.0)))
+
+        subdivided = []
+        for cell in cells:
+            row_start, row_stop, column_start, column_stop = cell
+            codes = {corners[row_start, column_start], corners[row_start, column_stop],
+                     corners[row_stop, column_start], corners[row_stop, column_stop]}
+            if len(codes) == 1:
+                leaves.append(cell + (codes.pop(),))
+            elif row_stop - row_start == 1 and column_stop - column_start == 1:
+                straddling.append(cell)
+            else:
+                row_middle = (row_start + row_stop + 1) // 2
+                column_middle = (column_start + column_stop + 1) // 2
+                for row_bounds in ((row_start, row_middle), (row_middle, row_stop)):
+                    for column_bounds in ((column_start, column_middle), (column_middle, column_stop)):
+                        if row_bounds[0] < row_bounds[1] and column_bounds[0] < column_bounds[1]:
+                            subdivided.append(row_bounds + column_bounds)
+        cells = subdivided
+
+    centers = evaluate([(row_start, column_start) for row_start, _, column_start, _ in straddling], 0.5)
+    leaves.extend(cell + (int(code),) for cell, code in zip(straddling, centers))
+    return AdaptiveMap(base_time.ut, base_time.Utc().isoformat(), grid.resolution, grid.bbox, leaves, evaluations)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compute a crescent visibility map.")
+    parser.add_argument("date", help="UTC date of the evening (YYYY-MM-DD)")
+    parser.add_argument("path", help="Map directory")
+    parser.add_argument("--resolution", type=float, default=1.0, help="Cell size in degrees")
+    parser.add_argument("--bbox", type=float, nargs=4, default=WORLD, metavar=("SOUTH", "NORTH", "WEST", "EAST"))
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--render", help="Also draw the map to this image file")
+    args = parser.parse_args()
+
+    year, month, day = (int(part) for part in args.date.split("-"))
+    path = generate_map(astronomy.Time.Make(year, month, day, 0, 0, 0), args.path, args.resolution,
+                        args.bbox, max_workers=args.workers)
+    if args.render:
+        render_map(path, args.render)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,27 +1,190 @@
 #!/usr/bin/env python3
-import matplotlib.pyplot as plt
 import math
 import numpy
 import utils.astronomy_ as astronomy
+from typing import NamedTuple, Optional
 #import pandas
-from tqdm import tqdm
 
 
 KM_PER_AU = 1.4959787069098932e+8   #<const> The number of kilometers per astronomical unit.
+MOON_MEAN_RADIUS_KM = 1737.4        #<const> Same value as the astronomy engine's, used by Libration.
 
-def calculate(base_time, latitude, longitude):
-    observer = astronomy.Observer(latitude, longitude)
+STATUS_OK = "ok"                            # every field is computed
+STATUS_NO_SET = "no_set"                    # the Sun or the Moon does not set within a day
+STATUS_MOON_SETS_FIRST = "moon_sets_first"  # negative lag time, q_code is "E"
+
+# Keys of the dictionary returned by calculate, in the order of the VisibilityResult fields
+DICT_KEYS = (
+    "lat", "long", "sunset", "moonset", "lag time", "best time", "sun alt", "sun az",
+    "moon elong geo", "moon elong topo", "moon alt", "monn az", "lunar parllax", "SD", "SD_topo",
+    "COSARCV", "ARCV", "DALT", "DAZ", "ARCL", "W_topo", "q_code", "V"
+)
+# Fields holding UT days, converted to datetimes in the dictionary
+TIME_FIELDS = ("sunset", "moonset", "best_time")
+
+
+class VisibilityResult(NamedTuple):
+    """Typed result of `calculate_result`.
+
+    Times (sunset, moonset, best_time) are UT days since J2000, as in `astronomy.Time.ut`.
+    Angles are in degrees, SD, SD_topo, lunar_parallax and W_topo in arcminutes. Fields
+    that are not computed because of an early exit (see `status`) are NaN, and q_code
+    is None (or "E" when the Moon sets first).
+    """
+    status: str
+    lat: float
+    long: float
+    sunset: float = math.nan
+    moonset: float = math.nan
+    lag_time: float = math.nan
+    best_time: float = math.nan
+    sun_alt: float = math.nan
+    sun_az: float = math.nan
+    moon_elong_geo: float = math.nan
+    moon_elong_topo: float = math.nan
+    moon_alt: float = math.nan
+    moon_az: float = math.nan
+    lunar_parallax: float = math.nan
+    SD: float = math.nan
+    SD_topo: float = math.nan
+    COSARCV: float = math.nan
+    ARCV: float = math.nan
+    DALT: float = math.nan
+    DAZ: float = math.nan
+    ARCL: float = math.nan
+    W_topo: float = math.nan
+    q_code: Optional[str] = None
+    V: float = math.nan
+
+    def to_dict(self):
+        """Convert to the dictionary returned by `calculate` (empty or {"q_code": "E"} on early exits)."""
+        if self.status == STATUS_NO_SET:
+            return {}
+        if self.status == STATUS_MOON_SETS_FIRST:
+            return {"q_code": "E"}
+        return {
+            key: astronomy.Time(value).Utc() if field in TIME_FIELDS else value
+            for key, field, value in zip(DICT_KEYS, self._fields[1:], self[1:])
+        }
+
+
+STATUS_CODES = (STATUS_OK, STATUS_NO_SET, STATUS_MOON_SETS_FIRST)
+FLOAT_FIELDS = tuple(field for field in VisibilityResult._fields if field not in ("status", "q_code"))
+
+
+class VisibilityResultArray:
+    """Column-wise storage of many `VisibilityResult`, one NumPy array per field.
+
+    Intended for maps and dataset runs over millions of points, where building one
+    dictionary per point exhausts memory. Columns are read with `column(name)` or as
+    attributes (e.g. `results.ARCV`); a single row is rebuilt with `results[i]`.
+
+    Example:
+        results = VisibilityResultArray()
+        for lat in range(-60, 61):
+            results.append(calculate_result(base_time, lat, 0))
+        visible = results.V >= 5.65
+    """
+
+    def __init__(self, capacity=1024):
+        self._size = 0
+        self._status = numpy.zeros(capacity, dtype=numpy.int8)
+        self._q_code = numpy.zeros(capacity, dtype="<U1")
+        self._floats = numpy.full((len(FLOAT_FIELDS), capacity), numpy.nan)
+
+    @classmethod
+    def from_results(cls, results):
+        results = list(results)
+        array = cls(max(len(results), 1))
+        for result in results:
+            array.append(result)
+        return array
+
+    @classmethod
+    def from_columns(cls, status, q_code, **columns):
+        """Build the array directly from columns.
+
+        Args:
+            status: Status of each result, as strings or as indexes in STATUS_CODES.
+            q_code: Visibility code of each result ("" or None when not computed).
+            columns: One array per float field of VisibilityResult. Missing fields are NaN.
+        """
+        status = numpy.asarray(status)
+        if status.dtype.kind in "US":
+            status = numpy.array([STATUS_CODES.index(code) for code in status], dtype=numpy.int8)
+        size = len(status)
+        array = cls(max(size, 1))
+        array._size = size
+        array._status[:size] = status
+        array._q_code[:size] = [code or "" for code in q_code]
+        for name, column in columns.items():
+            array._floats[FLOAT_FIELDS.index(name), :size] = column
+        return array
+
+    def append(self, result):
+        if self._size == len(self._status):
+            self._grow()
+        self._status[self._size] = STATUS_CODES.index(result.status)
+        self._q_code[self._size] = result.q_code or ""
+        self._floats[:, self._size] = result[1:-2] + result[-1:] # every field but status and q_code
+        self._size += 1
+
+    def _grow(self):
+        capacity = 2 * len(self._status)
+        self._status = numpy.resize(self._status, capacity)
+        self._q_code = numpy.resize(self._q_code, capacity)
+        floats = numpy.full((len(FLOAT_FIELDS), capacity), numpy.nan)
+        floats[:, :self._size] = self._floats[:, :self._size]
+        self._floats = floats
+
+    def column(self, name):
+        """Return the column of a VisibilityResult field as an array (a view for numbers)."""
+        if name == "status":
+            return numpy.array(STATUS_CODES)[self._status[:self._size]]
+        if name == "q_code":
+            return self._q_code[:self._size]
+        return self._floats[FLOAT_FIELDS.index(name), :self._size]
+
+    def __getattr__(self, name):
+        if name in VisibilityResult._fields:
+            return self.column(name)
+        raise AttributeError(name)
+
+    def __len__(self):
+        return self._size
+
+    def __getitem__(self, index):
+        if not -self._size <= index < self._size:
+            raise IndexError(index)
+        index %= self._size
+        values = dict(zip(FLOAT_FIELDS, self._floats[:, index].tolist()))
+        return VisibilityResult(
+            status=STATUS_CODES[self._status[index]],
+            q_code=str(self._q_code[index]) or None,
+            **values
+        )
+
+    @property
+    def nbytes(self):
+        return self._status[:self._size].nbytes + self._q_code[:self._size].nbytes + self._floats[:, :self._size].nbytes
+
+
+def calculate(base_time, latitude, longitude, height=0.0):
+    return calculate_result(base_time, latitude, longitude, height).to_dict()
+
+def calculate_result(base_time, latitude, longitude, height=0.0):
+    observer = astronomy.Observer(latitude, longitude, height)
     time = base_time.AddDays(-observer.longitude / 360) # this corrects the base time based on timezone
     sunset   = astronomy.SearchRiseSet(astronomy.Body.Sun,  observer, astronomy.Direction.Set, time, 1)
     moonset  = astronomy.SearchRiseSet(astronomy.Body.Moon, observer, astronomy.Direction.Set, time, 1)
-    if sunset is None or moonset is None: return {}
+    if sunset is None or moonset is None: return VisibilityResult(STATUS_NO_SET, observer.latitude, observer.longitude)
     #print(latitude, longitude)
 
     # https://astro.ukho.gov.uk/moonwatch/background.html
     # lag time: The time interval between sunset and moonset. The lag time is usually
     # given in minutes. It can be negative, indicating that the Moon sets before the Sun.
     lag_time = moonset.ut - sunset.ut
-    if lag_time < 0: return {"q_code": "E"}
+    if lag_time < 0: return VisibilityResult(STATUS_MOON_SETS_FIRST, observer.latitude, observer.longitude, sunset.ut, moonset.ut, lag_time, q_code="E")
 
     # best time: an empirical prediction of the time which gives the observer the best opportunity
     # to see the new crescent Moon (Sunset time + (4/9)*Lag time).
@@ -59,19 +222,13 @@ def calculate(base_time, latitude, longitude):
     DAZ = sun_az - moon_az
     DALT = moon_alt - sun_alt
     COSARCV = math.cos(math.radians(ARCL))/math.cos(math.radians(DAZ))
-    if -1 <= COSARCV <= 1: ARCV = math.degrees(math.acos(COSARCV)) #math.degrees(math.acos(math.cos(math.radians(ARCL))/math.cos(math.radians(DAZ)))) #moon_alt - sun_alt
-    elif COSARCV < -1: ARCV = math.degrees(math.acos(-1))
-    elif COSARCV > 1: ARCV = math.degrees(math.acos(1)) 
+    ARCV = _arcv(COSARCV)
     #print(ARCV)
 
     W_topo = SD_topo * (1 - (math.cos(math.radians(ARCL)))) #in arcminutes
     #q = (ARCV - (11.8371 - 6.3226*W_topo + 0.7319*W_topo**2 - 0.1018*W_topo**3)) / 10
-    V = ARCV - (7.1651 - 6.3226 * W_topo + 0.7319 * math.pow(W_topo, 2) - 0.1018 * math.pow(W_topo, 3))
-
-    if V >= 5.65: q_code = 'A' # Crescent is visible by naked eye
-    elif +5.65 > V >= 2: q_code = 'B' # Crescent is visible by optical aid
-    elif +2 > V >= -0.96: q_code = 'C' # Crescent is visible only by optical aid
-    elif -0.96 > V: q_code = 'D'
+    V = _odeh_V(ARCV, W_topo)
+    q_code = _odeh_q_code(V)
 
     #if q > +0.216: q_code = 'A' # Crescent easily visible
     #elif +0.216 >= q > -0.014: q_code = 'B' # Crescent visible under perfect conditions
@@ -80,53 +237,105 @@ def calculate(base_time, latitude, longitude):
     #elif -0.232 >= q > -0.293: q_code = 'E' # Crescent not visible with telescope
     #elif -0.293 >= q: q_code = 'F'
 
+    return VisibilityResult(
+        status=STATUS_OK,
+        lat=observer.latitude,
+        long=observer.longitude,
+        sunset=sunset.ut,
+        moonset=moonset.ut,
+        lag_time=lag_time,
+        best_time=best_time.ut,
+        sun_alt=sun_alt,
+        sun_az=sun_az,
+        moon_elong_geo=moon_elongation_geo.elongation,
+        moon_elong_topo=moon_elongation_topo,
+        moon_alt=moon_alt,
+        moon_az=moon_az,
+        lunar_parallax=lunar_parallax,
+        SD=SD,
+        SD_topo=SD_topo,
+        COSARCV=COSARCV,
+        ARCV=ARCV,
+        DALT=DALT,
+        DAZ=DAZ,
+        ARCL=ARCL,
+        W_topo=W_topo,
+        q_code=q_code,
+        V=V
+    )
+
+def calculate_features(base_time, latitude, longitude, height=0.0):
+    """Fast version of `calculate` returning only the model features and the Odeh criterion.
+
+    The result holds "ARCV", "W_topo", "V" and "q_code" (same early exits as `calculate`).
+    The geocentric elongation, the datetime conversions and the unused fields are skipped,
+    and the lunar semi-diameter is derived from the Moon vector already computed instead
+    of a separate `Libration` call.
+    """
+    observer = astronomy.Observer(latitude, longitude, height)
+    time = base_time.AddDays(-observer.longitude / 360) # this corrects the base time based on timezone
+    sunset   = astronomy.SearchRiseSet(astronomy.Body.Sun,  observer, astronomy.Direction.Set, time, 1)
+    moonset  = astronomy.SearchRiseSet(astronomy.Body.Moon, observer, astronomy.Direction.Set, time, 1)
+    if sunset is None or moonset is None: return {}
+
+    lag_time = moonset.ut - sunset.ut
+    if lag_time < 0: return {"q_code": "E"}
+    best_time = astronomy.Time(sunset.ut + lag_time * 4/9)
+
+    sun_equator = astronomy.Equator(astronomy.Body.Sun, best_time, observer, True, True)
+    sun_horizon = astronomy.Horizon(best_time, observer, sun_equator.ra, sun_equator.dec, astronomy.Refraction.Airless)
+    moon_equator = astronomy.Equator(astronomy.Body.Moon, best_time, observer, True, True)
+    moon_horizon = astronomy.Horizon(best_time, observer, moon_equator.ra, moon_equator.dec, astronomy.Refraction.Airless)
+    moon_alt = moon_horizon.altitude
+
+    # Geocentric Moon vector (of date) = topocentric vector + observer vector, as in Libration
+    observer_vector = astronomy.ObserverVector(best_time, observer, True)
+    dist_km = KM_PER_AU * math.sqrt(
+        (moon_equator.vec.x + observer_vector.x) ** 2 +
+        (moon_equator.vec.y + observer_vector.y) ** 2 +
+        (moon_equator.vec.z + observer_vector.z) ** 2
+    )
+    SD = math.degrees(math.atan(MOON_MEAN_RADIUS_KM / math.sqrt(dist_km*dist_km - MOON_MEAN_RADIUS_KM*MOON_MEAN_RADIUS_KM))) * 60 #in arcminutes
+    lunar_parallax = SD/0.27245 #in arcminutes
+    SD_topo = SD * (1 + (math.sin(math.radians(moon_alt)) * math.sin(math.radians(lunar_parallax/60))))
+
+    ARCL = astronomy.AngleBetween(sun_equator.vec, moon_equator.vec)
+    DAZ = sun_horizon.azimuth - moon_horizon.azimuth
+    ARCV = _arcv(math.cos(math.radians(ARCL))/math.cos(math.radians(DAZ)))
+    W_topo = SD_topo * (1 - (math.cos(math.radians(ARCL))))
+    V = _odeh_V(ARCV, W_topo)
+
     return {
-        "lat": observer.latitude,
-        "long": observer.longitude,
-        "sunset": sunset.Utc(),
-        "moonset": moonset.Utc(),
-        "lag time": lag_time,
-        "best time": best_time.Utc(),
-        #"sun dist": sun_distance,
-        "sun alt": sun_alt,
-        "sun az": sun_az,
-        "moon elong geo": moon_elongation_geo.elongation,
-        "moon elong topo": moon_elongation_topo,
-        #"moon dist": moon_distance,
-        "moon alt": moon_alt,
-        "monn az": moon_az,
-        "lunar parllax": lunar_parallax,
-        #"HP": HP,
-        "SD": SD,
-        "SD_topo": SD_topo,
-        "COSARCV": COSARCV,
         "ARCV": ARCV,
-        "DALT": DALT,
-        "DAZ": DAZ,
-        "ARCL": ARCL,
         "W_topo": W_topo,
-        "q_code": q_code,
-        "V": V
+        "V": V,
+        "q_code": _odeh_q_code(V)
     }
 
-def run(base_time):
-    result = []
-    STEPS = 3
-    H = numpy.ndarray(shape=(180 // STEPS, 360 // STEPS))
-    for lng in tqdm(range(0, 360, STEPS)):
-        for lat in range(0, 180, STEPS):
-            r = calculate(base_time, 90 - lat, lng - 180)
-            if 'q_code' in r:
-                result.append(r)
-                H[lat // STEPS, lng // STEPS] = ord('D') - ord(r['q_code'])
-            else:
-                H[lat // STEPS, lng // STEPS] = 0
-
-    #result = pandas.DataFrame.from_records(result)
-    #result.to_excel("output_" + str(base_time.Utc()).replace(":", "-") + " (" + str(STEPS) + " steps)" + ".xlsx") # + str(base_time.Utc()) + 
-
-    plt.imshow(H)
-    plt.show()
+def _arcv(COSARCV):
+    if -1 <= COSARCV <= 1: return math.degrees(math.acos(COSARCV)) #math.degrees(math.acos(math.cos(math.radians(ARCL))/math.cos(math.radians(DAZ)))) #moon_alt - sun_alt
+    elif COSARCV < -1: return math.degrees(math.acos(-1))
+    else: return math.degrees(math.acos(1))
+
+def _odeh_V(ARCV, W_topo):
+    return ARCV - (7.1651 - 6.3226 * W_topo + 0.7319 * math.pow(W_topo, 2) - 0.1018 * math.pow(W_topo, 3))
+
+def _odeh_q_code(V):
+    if V >= 5.65: return 'A' # Crescent is visible by naked eye
+    elif +5.65 > V >= 2: return 'B' # Crescent is visible by optical aid
+    elif +2 > V >= -0.96: return 'C' # Crescent is visible only by optical aid
+    else: return 'D'
+
+def run(base_time, path=None, resolution=3.0):
+    # Maps are computed in parallel into a directory (see utils.maps), then drawn
+    import tempfile
+    from utils.maps import generate_map, render_map
+
+    if path is None:
+        with tempfile.TemporaryDirectory() as path:
+            render_map(generate_map(base_time, path, resolution))
+    else:
+        render_map(generate_map(base_time, path, resolution))
 
 #run(astronomy.Time.Make(2022, 6, 29, 0, 0, 0))
 #run(astronomy.Time.Make(2022, 6, 30, 0, 0, 0))
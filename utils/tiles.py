@@ -0,0 +1,202 @@
+"""XYZ tiles of the visibility maps, for web map front ends.
+
+Tiles follow the usual Web Mercator `z/x/y` scheme. A tile is computed on its first
+request with `calculate_batch`, on a grid of `samples` x `samples` pixel centers, and
+stored in an on-disk cache where its file name is the hash of everything it depends
+on (evening, tile, layer, sampling and the version of the sources in TILE_FILES). The
+least recently used tiles are evicted above a size budget.
+
+Layers:
+    q_code: 256x256 palette PNG with the q_code colors, transparent where the Sun or
+            the Moon does not set.
+    V: `samples` x `samples` little-endian float32 values of V, rows from north to
+       south, NaN where V is not defined.
+"""
+import hashlib
+import math
+import os
+import struct
+import threading
+import zlib
+from pathlib import Path
+from typing import Iterable, Union
+
+import numpy
+import utils.astronomy_ as astronomy
+from utils.cache import ENGINE_FILES, engine_version
+from utils.maps import NO_SET, PENDING, Q_CODES, encode_q_codes
+
+TILE_SIZE = 256
+LAYERS = {"q_code": "png", "V": "bin"}
+# RGB of the q_code colors: royalblue, seagreen, gold, coral, slategray
+Q_CODE_RGB = {
+    "A": (65, 105, 225),
+    "B": (46, 139, 87),
+    "C": (255, 215, 0),
+    "D": (255, 127, 80),
+    "E": (112, 128, 144),
+}
+# Sources the tiles depend on: the engine, plus the batch computation, the q_code
+# encoding and the tile rendering
+TILE_FILES = ENGINE_FILES + tuple(
+    Path(__file__).resolve().parent / name for name in ("batch.py", "maps.py", "tiles.py")
+)
+
+
+def tile_coordinates(z: int, x: int, y: int, samples: int = 64):
+    """Return the latitudes and longitudes of the sample centers of a tile, rows from north to south."""
+    fractions = (numpy.arange(samples) + 0.5) / samples
+    longitudes = (x + fractions) / 2 ** z * 360.0 - 180.0
+    latitudes = numpy.degrees(numpy.arctan(numpy.sinh(math.pi * (1.0 - 2.0 * (y + fractions) / 2 ** z))))
+    return numpy.meshgrid(latitudes, longitudes, indexing="ij")
+
+
+def encode_png(indices: numpy.ndarray, palette, transparent: Iterable[int] = ()) -> bytes:
+    """Encode a 2-D array of palette indices as an 8-bit palette PNG."""
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+    height, width = indices.shape
+    alpha = bytes(0 if index in set(transparent) else 255 for index in range(len(palette)))
+    # Each row starts with filter type 0 (none)
+    rows = numpy.column_stack([numpy.zeros(height, dtype=numpy.uint8), indices.astype(numpy.uint8)])
+    return b"".join([
+        b"\x89PNG\r\n\x1a\n",
+        chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 3, 0, 0, 0)),
+        chunk(b"PLTE", bytes(channel for color in palette for channel in color)),
+        chunk(b"tRNS", alpha),
+        chunk(b"IDAT", zlib.compress(rows.tobytes(), 9)),
+        chunk(b"IEND", b""),
+    ])
+
+
+def render_tile(base_time: astronomy.Time, z: int, x: int, y: int, layer: str = "q_code", samples: int = 64) -> bytes:
+    """Compute a tile of the visibility map of an evening.
+
+    Args:
+        base_time: The date of the evening, as given to `calculate`.
+        z: Zoom level.
+        x: Tile column, from the antimeridian eastwards.
+        y: Tile row, from the north.
+        layer: "q_code" for a PNG tile, "V" for a binary tile of V values.
+        samples: Number of computed pixels along each side of the tile, dividing 256.
+
+    Returns:
+        The content of the tile.
+    """
+    from utils.batch import calculate_batch
+
+    if layer not in LAYERS:
+        raise ValueError(f"Unknown layer: {layer}")
+    if not (0 <= x < 2 ** z and 0 <= y < 2 ** z) or TILE_SIZE % samples:
+        raise ValueError(f"Invalid tile: {z}/{x}/{y} with {samples} samples")
+    latitudes, longitudes = tile_coordinates(z, x, y, samples)
+    result = calculate_batch(base_time, latitudes, longitudes)
+
+    if layer == "V":
+        return result.V.reshape(latitudes.shape).astype("<f4").tobytes()
+    codes = encode_q_codes(result.q_code).reshape(latitudes.shape)
+    scale = TILE_SIZE // samples
+    palette = [(0, 0, 0)] + [Q_CODE_RGB[code] for code in Q_CODES] + [(0, 0, 0)]
+    return encode_png(codes.repeat(scale, axis=0).repeat(scale, axis=1), palette, (PENDING, NO_SET))
+
+
+class TileCache:
+    """On-disk cache of visibility map tiles, computed on their first request.
+
+    Tiles are stored under the hash of their inputs, so a change of the engine or of
+    the tile computation (TILE_FILES) never serves stale tiles. The least recently used tiles are deleted when the cache grows
+    above `max_bytes`. The cache is safe to share between threads and processes.
+
+    Example:
+        tiles = TileCache("tiles")
+        png = tiles.get(astronomy.Time.Make(2025, 3, 29, 0, 0, 0), 2, 1, 1)
+    """
+
+    def __init__(self, directory: Union[str, Path], max_bytes: int = 512 * 2 ** 20, samples: int = 64):
+        """Open (or create) the tile cache.
+
+        Args:
+            directory: Directory of the tile files.
+            max_bytes: Maximum total size of the tiles, the least recently used are evicted.
+            samples: Number of computed pixels along each side of the tiles.
+        """
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.samples = samples
+        self.version = engine_version(TILE_FILES)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._size = sum(path.stat().st_size for path in self._files())
+
+    def _files(self):
+        return self.directory.glob("*/*.tile")
+
+    def _path(self, base_time: astronomy.Time, z: int, x: int, y: int, layer: str) -> Path:
+        key = f"{self.version}:{base_time.ut!r}:{z}/{x}/{y}:{layer}:{self.samples}"
+        digest = hashlib.sha256(key.encode("utf-8")).hexdigest()
+        return self.directory / digest[:2] / f"{digest[2:]}.{LAYERS[layer]}.tile"
+
+    def get(self, base_time: astronomy.Time, z: int, x: int, y: int, layer: str = "q_code") -> bytes:
+        """Return a tile, computing and storing it on a miss (see `render_tile`)."""
+        if layer not in LAYERS:
+            raise ValueError(f"Unknown layer: {layer}")
+        path = self._path(base_time, z, x, y, layer)
+        try:
+            content = path.read_bytes()
+            # The modification time is the last access time of the LRU eviction
+            os.utime(path)
+            with self._lock:
+                self.hits += 1
+            return content
+        except FileNotFoundError:
+            pass
+
+        content = render_tile(base_time, z, x, y, layer, self.samples)
+        path.parent.mkdir(exist_ok=True)
+        temporary = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}")
+        temporary.write_bytes(content)
+        os.replace(temporary, path)
+        with self._lock:
+            self.misses += 1
+            self._size += len(content)
+            self._evict()
+        return content
+
+    def warm(self, base_time: astronomy.Time, zooms: Iterable[int] = range(3), layer: str = "q_code") -> None:
+        """Compute every tile of the given zoom levels ahead of the requests."""
+        for z in zooms:
+            for x in range(2 ** z):
+                for y in range(2 ** z):
+                    self.get(base_time, z, x, y, layer)
+
+    def _evict(self) -> None:
+        """Delete the least recently used tiles above `max_bytes`."""
+        if self._size <= self.max_bytes:
+            return
+        # Other processes may share the directory, so rescan before evicting
+        files = []
+        for path in self._files():
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+        self._size = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if self._size <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            self._size -= size
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self._files())
+
+    def clear(self) -> None:
+        """Delete every cached tile."""
+        with self._lock:
+            for path in self._files():
+                path.unlink(missing_ok=True)
+            self._size = 0